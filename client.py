@@ -5,95 +5,289 @@ import sys
 import os
 import socket
 import json
+import threading
+import multiprocessing
+import Queue
 import argparse
 import common
 from copy import deepcopy
+from collections import deque
+from functools import partial
 
 
-# Analyse arguments
-parser = argparse.ArgumentParser(add_help=False)
-parser.add_argument("configFilePath")
-parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
-parser.add_argument("-v", "--verbose", metavar="on/off", help="enable/disable information messages on screen")
-parser.add_argument("-g", "--logging", metavar="on/off", help="enable/disable logging on file")
-parser.add_argument("-p", "--loggingPath", metavar="path", help="define path of logging file")
-parser.add_argument("-m", "--loggingFileMode", choices=["overwrite", "append"], help="define the mode in which the logging file has to be opened")
-args = parser.parse_args()
-
-# Add directory of the configuration file to sys.path before import crawler, so that the module can easily 
-# be overrided by placing the modified file in a subfolder, along with the configuration file itself
-configFileDir = os.path.dirname(os.path.abspath(args.configFilePath))
-sys.path = [configFileDir] + sys.path
-import crawler
-
-# Load configurations
-config = common.loadConfig(args.configFilePath)
-if (args.verbose is not None): config["global"]["echo"]["mandatory"]["verbose"] = common.str2bool(args.verbose)
-if (args.logging is not None): config["global"]["echo"]["mandatory"]["logging"] = common.str2bool(args.logging)
-if (args.loggingPath is not None): config["global"]["echo"]["mandatory"]["loggingpath"] = args.loggingPath
-if (args.loggingFileMode is not None): config["global"]["echo"]["mandatory"]["loggingfilemode"] = args.loggingFileMode
-
-# Connect to server
-processID = os.getpid()
-server = common.NetworkHandler()
-server.connect(config["global"]["connection"]["address"], config["global"]["connection"]["port"])
-server.send({"command": "CONNECT", "type": "client", "processid": processID})
-message = server.recv()
-if (message["command"] == "REFUSED"): sys.exit("ERROR: %s" % message["reason"])
-else: clientID = message["clientid"]
-
-# Configure echoing
-echo = common.EchoHandler(config["client"]["echo"], "client%s@%s[%s].log" % (clientID, socket.gethostname(), config["global"]["connection"]["port"]))
-
-# Get an instance of the crawler
-CrawlerClass = getattr(crawler, config["client"]["crawler"]["class"])
-collector = CrawlerClass(config["client"]["crawler"])
-
-# Execute collection
-echo.out("Connected to server with ID %s." % clientID)
-server.send({"command": "GET_ID"})
-while (True):
-    try:
-        message = server.recv()
-        
-        if (not message): 
-            echo.out("Connection to server has been abruptly closed.", "ERROR")
-            break
-        
-        command = message["command"]
-        
-        if (command == "GIVE_ID"):
-            resourceID = message["resourceid"]
-            filters = message["filters"]
-            
-            try: 
-                crawlerResponse = collector.crawl(resourceID, filters)
-            except SystemExit: 
-                echo.out("SystemExit exception while crawling resource %s. Execution aborted." % resourceID, "EXCEPTION")
-                server.send({"command": "EXCEPTION", "type": "error"})
+# ==================== Classes ====================
+class ResourcesPipeline():
+    # Keep a bounded window of resources leased from the server, so that crawlers can start working on the next
+    # resource right after finishing the current one, without waiting for a server round trip. Messages sent by the
+    # server are read by receive(), while crawling is done by work(), that must be run in one or more other threads
+    def __init__(self, server, echo, windowSize, batchSize):
+        self.server = server
+        self.echo = echo
+        self.windowSize = windowSize
+        self.batchSize = batchSize
+        self.resourcesQueue = Queue.Queue()
+        self.requestsAmounts = deque()
+        self.leasedAmount = 0
+        self.crawlingIDs = []
+        self.waiting = False
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def _send(self, message):
+        if (not self.stopped): self.server.send(message)
+
+    def _requestResources(self):
+        # When the server has no resources to give, stop asking for more until all the leased ones are
+        # reported back. The next request will then wait at the server side for new resources as usual
+        requestedAmount = sum(self.requestsAmounts)
+        if (self.waiting):
+            if (self.leasedAmount + requestedAmount > 0): return
+            self.waiting = False
+        while (self.leasedAmount + requestedAmount < self.windowSize):
+            amount = min(self.batchSize, self.windowSize - self.leasedAmount - requestedAmount)
+            if (amount > 1): self._send({"command": "GET_IDS", "amount": amount})
+            else: self._send({"command": "GET_ID"})
+            self.requestsAmounts.append(amount)
+            requestedAmount += amount
+
+    def _releaseResources(self):
+        releasedIDs = []
+        while True:
+            try: resource = self.resourcesQueue.get_nowait()
+            except Queue.Empty: break
+            if (resource is None): self.resourcesQueue.put(None); break
+            releasedIDs.append(resource[0])
+        if (releasedIDs):
+            self._send({"command": "RELEASE_IDS", "resourceids": releasedIDs})
+            self.leasedAmount -= len(releasedIDs)
+
+    def start(self):
+        with self.lock: self._requestResources()
+
+    def stop(self):
+        self.stopped = True
+        self.resourcesQueue.put(None)
+
+    def receive(self):
+        while (True):
+            try:
+                message = self.server.recv()
+
+                if (not message):
+                    if (not self.stopped): self.echo.out("Connection to server has been abruptly closed.", "ERROR")
+                    break
+
+                command = message["command"]
+
+                if (command == "GIVE_ID") or (command == "GIVE_IDS"):
+                    if (command == "GIVE_ID"): resourcesList = [{"resourceid": message["resourceid"], "filters": message["filters"]}]
+                    else: resourcesList = message["resources"]
+                    with self.lock:
+                        self.requestsAmounts.popleft()
+                        self.leasedAmount += len(resourcesList)
+                        for resource in resourcesList: self.resourcesQueue.put((resource["resourceid"], resource["filters"]))
+
+                elif (command == "NO_ID"):
+                    with self.lock:
+                        self.requestsAmounts.popleft()
+                        self.waiting = True
+                        if (message["release"]): self._releaseResources()
+                        self._requestResources()
+
+                elif (command == "FINISH"):
+                    reason = message["reason"]
+                    if (reason == "task done"): self.echo.out("Task done, client finished.")
+                    elif (reason == "shut down"): self.echo.out("Server shuting down, client finished.")
+                    else: self.echo.out("Client manually removed.")
+                    break
+
+            except:
+                if (not self.stopped): self.echo.out("Exception while processing data. Execution aborted.", "EXCEPTION")
+                break
+
+        self.stop()
+
+    def work(self, crawlFunction):
+        while (True):
+            resource = self.resourcesQueue.get()
+            if (resource is None):
+                self.resourcesQueue.put(None)
                 break
+            with self.lock: self.crawlingIDs.append(resource[0])
+            # Exceptions of the crawl function itself (not of the crawler) are reported as errors, as the worker can't go on
+            try: report = crawlFunction(*resource)
             except: 
-                echo.out("Exception while crawling resource %s." % resourceID, "EXCEPTION")
-                server.send({"command": "EXCEPTION", "type": "fail"})
-            else:
-                resourceInfo = crawlerResponse[0]
-                extraInfo = crawlerResponse[1]
-                newResources = None
-                if (config["global"]["feedback"]): newResources = crawlerResponse[2]
-                server.send({"command": "DONE_ID", "resourceinfo": resourceInfo, "extrainfo": extraInfo, "newresources": newResources})
-            
-        elif (command == "DONE_RET") or (command == "EXCEPTION_RET"):
-            server.send({"command": "GET_ID"})
-            
-        elif (command == "FINISH"):
-            reason = message["reason"]
-            if (reason == "task done"): echo.out("Task done, client finished.")
-            elif (reason == "shut down"): echo.out("Server shuting down, client finished.")
-            else: echo.out("Client manually removed.")
-            break
-            
+                self.echo.out("Exception in worker while crawling resource %s. Execution aborted." % resource[0], "EXCEPTION")
+                report = {"command": "EXCEPTION", "resourceid": resource[0], "type": "error"}
+            with self.lock:
+                self.crawlingIDs.remove(resource[0])
+                # The server closes the connection right after an error report, making available again all other
+                # resources leased to the client, except those still being crawled by the other workers
+                if (report["command"] == "EXCEPTION") and (report["type"] == "error"):
+                    report["inprogress"] = self.crawlingIDs
+                    self._send(report)
+                    self.stop()
+                    break
+                self._send(report)
+                self.leasedAmount -= 1
+                self._requestResources()
+
+
+# ==================== Methods ====================
+def crawl(collector, resourceID, filters):
+    # Crawl the resource and build the message that reports the result to the server
+    try:
+        crawlerResponse = collector.crawl(resourceID, filters)
+    except SystemExit:
+        echo.out("SystemExit exception while crawling resource %s. Execution aborted." % resourceID, "EXCEPTION")
+        return {"command": "EXCEPTION", "resourceid": resourceID, "type": "error"}
     except:
-        echo.out("Exception while processing data. Execution aborted.", "EXCEPTION")
-        break
+        echo.out("Exception while crawling resource %s." % resourceID, "EXCEPTION")
+        return {"command": "EXCEPTION", "resourceid": resourceID, "type": "fail"}
+    resourceInfo = crawlerResponse[0]
+    extraInfo = crawlerResponse[1]
+    newResources = None
+    if (feedback): newResources = crawlerResponse[2]
+    return {"command": "DONE_ID", "resourceid": resourceID, "resourceinfo": resourceInfo, "extrainfo": extraInfo, "newresources": newResources}
+    
+def startProcessCrawler(configFileDir, crawlerConfig, echoConfig, echoMandatoryConfig, loggingFileName, feedbackEnabled):
+    # Give each process of the workers pool its own crawler instance and echo handler. Everything is taken from the 
+    # arguments, as module globals are not inherited when processes are spawned instead of forked (on Windows, for example)
+    global processCollector
+    global echo
+    global feedback
+    sys.path = [configFileDir] + sys.path
+    import crawler
+    common.EchoHandler.mandatoryConfig.update(echoMandatoryConfig)
+    echo = common.EchoHandler(echoConfig, loggingFileName)
+    feedback = feedbackEnabled
+    processCollector = getattr(crawler, crawlerConfig["class"])(crawlerConfig)
+    
+def processCrawl(resourceID, filters):
+    return crawl(processCollector, resourceID, filters)
+
+
+# ==================== Main ====================
+# Processes of the workers pool may import this module again, so the client is run only when it is the main module
+if (__name__ == "__main__"):
+    # Analyse arguments
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("configFilePath")
+    parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
+    parser.add_argument("-v", "--verbose", metavar="on/off", help="enable/disable information messages on screen")
+    parser.add_argument("-g", "--logging", metavar="on/off", help="enable/disable logging on file")
+    parser.add_argument("-p", "--loggingPath", metavar="path", help="define path of logging file")
+    parser.add_argument("-m", "--loggingFileMode", choices=["overwrite", "append"], help="define the mode in which the logging file has to be opened")
+    args = parser.parse_args()
+
+    # Add directory of the configuration file to sys.path before import crawler, so that the module can easily 
+    # be overrided by placing the modified file in a subfolder, along with the configuration file itself
+    configFileDir = os.path.dirname(os.path.abspath(args.configFilePath))
+    sys.path = [configFileDir] + sys.path
+    import crawler
+
+    # Load configurations
+    config = common.loadConfig(args.configFilePath)
+    if (args.verbose is not None): config["global"]["echo"]["mandatory"]["verbose"] = common.str2bool(args.verbose)
+    if (args.logging is not None): config["global"]["echo"]["mandatory"]["logging"] = common.str2bool(args.logging)
+    if (args.loggingPath is not None): config["global"]["echo"]["mandatory"]["loggingpath"] = args.loggingPath
+    if (args.loggingFileMode is not None): config["global"]["echo"]["mandatory"]["loggingfilemode"] = args.loggingFileMode
+
+    # Connect to server
+    processID = os.getpid()
+    server = common.NetworkHandler()
+    server.connect(config["global"]["connection"]["address"], config["global"]["connection"]["port"])
+    server.send({"command": "CONNECT", "type": "client", "processid": processID})
+    message = server.recv()
+    if (message["command"] == "REFUSED"): sys.exit("ERROR: %s" % message["reason"])
+    else: clientID = message["clientid"]
+
+    # Configure echoing
+    loggingFileName = "client%s@%s[%s].log" % (clientID, socket.gethostname(), config["global"]["connection"]["port"])
+    echo = common.EchoHandler(config["client"]["echo"], loggingFileName)
+
+    # Get the crawler class
+    CrawlerClass = getattr(crawler, config["client"]["crawler"]["class"])
+    feedback = config["global"]["feedback"]
+
+    # Execute collection
+    echo.out("Connected to server with ID %s." % clientID)
+    workersAmount = config["client"]["workers"]
+
+    # Pipelined mode: crawl in separate worker threads while the main thread keeps the window of leased resources filled.
+    # Each worker has its own crawler instance, either in the worker thread itself or in a process of the workers pool
+    # (which is why process workers always run in this mode, even if there is just one of them and nothing to prefetch)
+    if (workersAmount > 1) or (config["client"]["prefetch"] > 0) or (config["client"]["workertype"] == "process"):
+        pipeline = ResourcesPipeline(server, echo, workersAmount + config["client"]["prefetch"], config["client"]["batchsize"])
+        if (config["client"]["workertype"] == "process"):
+            # Processes log to the same file as the client, so they must not truncate it
+            processEchoMandatoryConfig = dict(common.EchoHandler.mandatoryConfig, loggingfilemode = "append")
+            pool = multiprocessing.Pool(workersAmount, startProcessCrawler, (configFileDir, config["client"]["crawler"], config["client"]["echo"], processEchoMandatoryConfig, loggingFileName, feedback))
+            crawlFunctions = [lambda resourceID, filters: pool.apply(processCrawl, (resourceID, filters))] * workersAmount
+        else: 
+            crawlFunctions = [partial(crawl, CrawlerClass(config["client"]["crawler"])) for i in range(workersAmount)]
+        workersList = []
+        for crawlFunction in crawlFunctions:
+            worker = threading.Thread(target=pipeline.work, args=(crawlFunction,))
+            worker.daemon = True
+            worker.start()
+            workersList.append(worker)
+        pipeline.start()
+        pipeline.receive()
+        for worker in workersList: worker.join()
+        if (config["client"]["workertype"] == "process"): 
+            pool.close()
+            pool.join()
+
+    # Request/response mode: ask for new resources only after the previous ones have been reported
+    else:
+        collector = CrawlerClass(config["client"]["crawler"])
+        if (config["client"]["batchsize"] > 1): getIDMessage = {"command": "GET_IDS", "amount": config["client"]["batchsize"]}
+        else: getIDMessage = {"command": "GET_ID"}
+        server.send(getIDMessage)
+        while (True):
+            try:
+                message = server.recv()
+
+                if (not message):
+                    echo.out("Connection to server has been abruptly closed.", "ERROR")
+                    break
+
+                command = message["command"]
+
+                if (command == "GIVE_ID"):
+                    report = crawl(collector, message["resourceid"], message["filters"])
+                    server.send(report)
+                    if (report["command"] == "EXCEPTION") and (report["type"] == "error"): break
+
+                elif (command == "GIVE_IDS"):
+                    doneList = []
+                    exceptionsList = []
+
+                    # Crawl the whole batch, stopping at the first error. The server will make available
+                    # again the resources of the batch that were not reported back because of the error
+                    for resource in message["resources"]:
+                        report = crawl(collector, resource["resourceid"], resource["filters"])
+                        if (report["command"] == "DONE_ID"): doneList.append(report)
+                        else:
+                            exceptionsList.append(report)
+                            if (report["type"] == "error"): break
+
+                    server.send({"command": "DONE_IDS", "done": doneList, "exceptions": exceptionsList})
+                    if (exceptionsList) and (exceptionsList[-1]["type"] == "error"): break
+
+                elif (command == "DONE_RET") or (command == "EXCEPTION_RET") or (command == "DONE_IDS_RET"):
+                    server.send(getIDMessage)
+
+                elif (command == "FINISH"):
+                    reason = message["reason"]
+                    if (reason == "task done"): echo.out("Task done, client finished.")
+                    elif (reason == "shut down"): echo.out("Server shuting down, client finished.")
+                    else: echo.out("Client manually removed.")
+                    break
+
+            except:
+                echo.out("Exception while processing data. Execution aborted.", "EXCEPTION")
+                break
 
-server.close()
+    server.close()
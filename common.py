@@ -14,7 +14,9 @@ import inspect
 import json
 import logging
 import calendar
+import collections
 import xmltodict
+from copy import deepcopy
 from datetime import datetime
 
     
@@ -122,6 +124,7 @@ class NetworkHandler():
     def _defaultSerializer(self, obj):
         if isinstance(obj, datetime): return {"__datetime__": calendar.timegm(obj.utctimetuple())}
         elif isinstance(obj, set): return tuple(obj)
+        elif isinstance(obj, (FrozenDict, FrozenList)): return obj._data
         raise TypeError("'%s' is not JSON serializable" % obj)
         
     def _defaultDeserializer(self, dictionary):
@@ -158,10 +161,43 @@ class NetworkHandler():
         return json.loads(strMsg, object_hook = self._defaultDeserializer)
     
     def close(self):
-        self.sock.shutdown(socket.SHUT_RDWR)
+        # The connection may have already been reset by the other side
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error: pass
         self.sock.close()
         
         
+class FrozenDict(collections.Mapping):
+    """Read-only view of a dictionary.
+    
+    The dictionary is not copied, so the view costs the same regardless of its size. Dictionaries, lists and tuples nested in it are also returned as read-only views (see :func:`freeze`).
+    
+    """
+    def __init__(self, data): self._data = data
+    def __getitem__(self, key): return freeze(self._data[key])
+    def __iter__(self): return iter(self._data)
+    def __len__(self): return len(self._data)
+    def __repr__(self): return "FrozenDict(%r)" % (self._data,)
+    def __eq__(self, other): return (self._data == (other._data if isinstance(other, (FrozenDict, FrozenList)) else other))
+    def __ne__(self, other): return not (self == other)
+    
+    
+class FrozenList(collections.Sequence):
+    """Read-only view of a list or tuple.
+    
+    As in :class:`FrozenDict`, nothing is copied and nested dictionaries, lists and tuples are also returned as read-only views.
+    
+    """
+    def __init__(self, data): self._data = data
+    def __getitem__(self, index): 
+        if isinstance(index, slice): return FrozenList(self._data[index])
+        return freeze(self._data[index])
+    def __len__(self): return len(self._data)
+    def __repr__(self): return "FrozenList(%r)" % (self._data,)
+    def __eq__(self, other): return (self._data == (other._data if isinstance(other, (FrozenDict, FrozenList)) else other))
+    def __ne__(self, other): return not (self == other)
+        
+        
 # ==================== Methods ====================
 if (sys.platform == "win32"):
     import win32api, win32con
@@ -186,6 +222,33 @@ def str2bool(stringToConvert):
     if stringToConvert.lower() in ("false", "f", "no", "n", "off", "0"): return False
     raise TypeError("The value '%s' is not considered a valid boolean in this context." % stringToConvert)
     
+def freeze(value):
+    """Get a read-only view of a value.
+    
+    Args:
+        * *value* (any type): Dictionaries are wrapped in a :class:`FrozenDict` and lists and tuples in a :class:`FrozenList`. Any other value is returned as it is.
+       
+    Returns:
+        The read-only view of *value*.
+    
+    """
+    if isinstance(value, dict): return FrozenDict(value)
+    if isinstance(value, (list, tuple)): return FrozenList(value)
+    return value
+    
+def thaw(value):
+    """Get a modifiable copy of a value.
+    
+    Args:
+        * *value* (any type): Value to be copied. If it is a read-only view, the value behind the view is copied.
+       
+    Returns:
+        A deep copy of *value*, with plain dictionaries, lists and tuples in place of read-only views.
+    
+    """
+    if isinstance(value, (FrozenDict, FrozenList)): return deepcopy(value._data)
+    return deepcopy(value)
+    
 def loadConfig(configFilePath):
     configFile = open(configFilePath, "r")
     configDict = xmltodict.parse(configFile.read())
@@ -222,16 +285,70 @@ def loadConfig(configFilePath):
     if ("loopforever" not in config["server"]): config["server"]["loopforever"] = False
     else: config["server"]["loopforever"] = str2bool(config["server"]["loopforever"])
     
+    if ("engine" not in config["server"]): config["server"]["engine"] = "threaded"
+    else: config["server"]["engine"] = config["server"]["engine"].lower()
+    if (config["server"]["engine"] not in ("threaded", "async")): raise ValueError("Unknow value '%s' for parameter 'engine'." % config["server"]["engine"])
+    
+    if ("executorsize" not in config["server"]): config["server"]["executorsize"] = 16
+    else: config["server"]["executorsize"] = int(config["server"]["executorsize"])
+    if (config["server"]["executorsize"] < 2): raise ValueError("Parameter 'executorsize' must be at least 2.")
+    
         # Filters
     if ("filtering" not in config["server"]): config["server"]["filtering"] = {"filter": []}
+    if ("filter" not in config["server"]["filtering"]): config["server"]["filtering"]["filter"] = []
     if (not isinstance(config["server"]["filtering"]["filter"], list)): config["server"]["filtering"]["filter"] = [config["server"]["filtering"]["filter"]]
     
+    if ("poolsize" not in config["server"]["filtering"]): config["server"]["filtering"]["poolsize"] = 16
+    else: config["server"]["filtering"]["poolsize"] = int(config["server"]["filtering"]["poolsize"])
+    if (config["server"]["filtering"]["poolsize"] < 1): raise ValueError("Parameter 'poolsize' of filtering must be greater than zero.")
+    
     for filter in config["server"]["filtering"]["filter"]:
         if ("parallel" not in filter): filter["parallel"] = False
         else: filter["parallel"] = str2bool(filter["parallel"])
         
+        if ("concurrency" not in filter): filter["concurrency"] = 0
+        else: filter["concurrency"] = int(filter["concurrency"])
+        if (filter["concurrency"] < 0): raise ValueError("Parameter 'concurrency' of filter '%s' must be zero or greater." % filter["class"])
+        
+        if ("asynccallback" not in filter): filter["asynccallback"] = False
+        else: filter["asynccallback"] = str2bool(filter["asynccallback"])
+        if (filter["asynccallback"]) and (not filter["parallel"]): raise ValueError("Parameter 'asynccallback' of filter '%s' can only be set for parallel filters." % filter["class"])
+        
+        if ("callbackqueuesize" not in filter): filter["callbackqueuesize"] = 1000
+        else: filter["callbackqueuesize"] = int(filter["callbackqueuesize"])
+        if (filter["callbackqueuesize"] < 1): raise ValueError("Parameter 'callbackqueuesize' of filter '%s' must be greater than zero." % filter["class"])
+        
+        if ("readonly" not in filter): filter["readonly"] = False
+        else: filter["readonly"] = str2bool(filter["readonly"])
+        
+        # Sequential filters may pass information to the next ones through extraInfo, so their results can't be cached
+        if ("applycachesize" not in filter): filter["applycachesize"] = 0
+        else: filter["applycachesize"] = int(filter["applycachesize"])
+        if (filter["applycachesize"] < 0): raise ValueError("Parameter 'applycachesize' of filter '%s' must be zero or greater." % filter["class"])
+        if (filter["applycachesize"] > 0) and (not filter["parallel"]): raise ValueError("Parameter 'applycachesize' of filter '%s' can only be set for parallel filters." % filter["class"])
+        
+        if ("applycachettl" not in filter): filter["applycachettl"] = 0
+        else: filter["applycachettl"] = float(filter["applycachettl"])
+        if (filter["applycachettl"] < 0): raise ValueError("Parameter 'applycachettl' of filter '%s' must be zero or greater." % filter["class"])
+        
     # Client default values
     if ("echo" not in config["client"]): config["client"]["echo"] = {}
+    
+    if ("batchsize" not in config["client"]): config["client"]["batchsize"] = 1
+    else: config["client"]["batchsize"] = int(config["client"]["batchsize"])
+    if (config["client"]["batchsize"] < 1): raise ValueError("Parameter 'batchsize' must be greater than zero.")
+    
+    if ("prefetch" not in config["client"]): config["client"]["prefetch"] = 0
+    else: config["client"]["prefetch"] = int(config["client"]["prefetch"])
+    if (config["client"]["prefetch"] < 0): raise ValueError("Parameter 'prefetch' must be zero or greater.")
+    
+    if ("workers" not in config["client"]): config["client"]["workers"] = 1
+    else: config["client"]["workers"] = int(config["client"]["workers"])
+    if (config["client"]["workers"] < 1): raise ValueError("Parameter 'workers' must be greater than zero.")
+    
+    if ("workertype" not in config["client"]): config["client"]["workertype"] = "thread"
+    else: config["client"]["workertype"] = config["client"]["workertype"].lower()
+    if (config["client"]["workertype"] not in ("thread", "process")): raise ValueError("Unknow value '%s' for parameter 'workertype'." % config["client"]["workertype"])
             
     return config
     
\ No newline at end of file
@@ -6,6 +6,10 @@ The filters are sequentially applied in the same order in wich they were specifi
 
 """
 
+import time
+import threading
+import collections
+import common
 import persistence
 
 
@@ -19,6 +23,10 @@ class BaseFilter():
         
         """
         self._extractConfig(configurationsDictionary)
+        self.applyCache = collections.OrderedDict()
+        self.applyCacheLock = threading.Lock()
+        self.applyCacheHits = 0
+        self.applyCacheMisses = 0
         
     def _extractConfig(self, configurationsDictionary):
         """Extract and store configurations.
@@ -48,10 +56,49 @@ class BaseFilter():
             
         Returns:   
             A dictionary containing the desired filter information to be sent to clients.
+            
+        Filters receive a copy of *resourceInfo*, which they are free to change. Filters with the ``readonly`` option set receive a read-only view of it instead (see :func:`common.freeze`), which avoids copying but can't be changed. The same applies to the parameters of :meth:`callback`.
         
         """
         return {}
         
+    def applyCached(self, resourceID, resourceInfo, extraInfo): 
+        """Call :meth:`apply`, reusing its previous results for the same resource.
+        
+        The server calls this method instead of calling :meth:`apply` directly, so it is not meant to be overridden. Results are identified by the resource ID and by the content of *resourceInfo*, so that they are computed again whenever the information changes. Up to ``applycachesize`` results are kept (the least recently used ones being discarded first), each one for at most ``applycachettl`` seconds, if it is greater than zero. If ``applycachesize`` is zero, :meth:`apply` is always called.
+        
+        """
+        if (self.config["applycachesize"] <= 0): return self.apply(resourceID, resourceInfo, extraInfo)
+        try: 
+            key = (resourceID, _cacheKey(resourceInfo))
+            hash(key)
+        except TypeError: return self.apply(resourceID, resourceInfo, extraInfo)
+        
+        currentTime = time.time()
+        with self.applyCacheLock:
+            if (key in self.applyCache):
+                (expirationTime, data) = self.applyCache.pop(key)
+                if (expirationTime is None) or (expirationTime > currentTime): 
+                    self.applyCache[key] = (expirationTime, data)
+                    self.applyCacheHits += 1
+                    return data
+            self.applyCacheMisses += 1
+            
+        data = self.apply(resourceID, resourceInfo, extraInfo)
+        with self.applyCacheLock:
+            self.applyCache[key] = ((currentTime + self.config["applycachettl"]) if (self.config["applycachettl"] > 0) else None, data)
+            while (len(self.applyCache) > self.config["applycachesize"]): self.applyCache.popitem(last = False)
+        return data
+        
+    def applyCacheStatus(self): 
+        """Get the status of the results cache of :meth:`applyCached`.
+        
+        Returns:   
+            A dictionary with the number of results currently in the cache (*size*) and the number of cache hits (*hits*) and misses (*misses*) so far, or ``None`` if the cache is disabled.
+        
+        """
+        if (self.config["applycachesize"] <= 0): return None
+        with self.applyCacheLock: return {"size": len(self.applyCache), "hits": self.applyCacheHits, "misses": self.applyCacheMisses}
     
     def callback(self, resourceID, resourceInfo, newResources, extraInfo): 
         """Process information sent by clients after a resource has been crawled.
@@ -61,6 +108,8 @@ class BaseFilter():
             * *resourceInfo* (dict): Resource information dictionary sent by client. Sequential filters receive this parameter as reference, so they can alter its value, but parallel filters receive just a copy of it. The server will store the final value of *resourceInfo* as it is after all filters were called back.
             * *newResources* (list): List of new resources sent by client to be stored by the server. Sequential filters receive this parameter as reference, so they can alter its value, but parallel filters receive just a copy of it. The server will store the final value of *newResources* as it is after all filters were called back.
             * *extraInfo* (dict): Dictionary that contains information sent by client to filters. Sequential filters receive this parameter as reference, so they can alter its value, but parallel filters receive just a copy of it. As in :meth:`apply`, *extraInfo* can also be used to pass information among sequential filters (in the case of sequential filters, the original information received from crawler is stored in *extraInfo["original"]*, so it is available at any time). This information is not used by the server.
+            
+        Parallel filters with the ``asynccallback`` option set are called back in background, after the server has already answered the client. Their pending callbacks are kept in a queue of up to ``callbackqueuesize`` entries (1000, by default), and clients have to wait only when this queue is full. The server marks the resource as ``SUCCEEDED`` only after its asynchronous callbacks have run (or as ``ERROR``, if any of them raises an exception), so resources whose callbacks are lost when the server stops are left ``INPROGRESS``. All pending callbacks are run before the filter is shut down.
         
         """
         pass
@@ -98,8 +147,17 @@ class SaveResourcesFilter(BaseFilter):
     def callback(self, resourceID, resourceInfo, newResources, extraInfo):
         if (self.config["parallel"]): extraResources = extraInfo[self.name]
         else: extraResources = extraInfo["original"][self.name]
+        if (self.config["readonly"]): extraResources = common.thaw(extraResources)
         self.persist.insert(extraResources)
         
     def finish(self): self.persist.finish()
     def shutdown(self): self.persist.shutdown()
+    
+    
+def _cacheKey(value):
+    # Build a hashable equivalent of a resource information, to be used as part of the key of cached results
+    if isinstance(value, collections.Mapping): return tuple(sorted((k, _cacheKey(v)) for k, v in value.iteritems()))
+    if isinstance(value, (list, tuple, common.FrozenList)): return tuple(_cacheKey(v) for v in value)
+    if isinstance(value, set): return frozenset(value)
+    return value
         
\ No newline at end of file
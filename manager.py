@@ -119,7 +119,7 @@ else:
                         "%.2f" % clientStatus["time"]["agrcrawler"], 
                         clientStatus["time"]["timingmeasures"], 
                         clientStatus["time"]["crawlingmeasures"],
-                        clientStatus["resourceid"] if (clientStatus["resourceid"]) else "waiting", 
+                        clientStatus["resourceids"] if (clientStatus["resourceids"]) else "waiting", 
                         clientStatus["amount"]])
             status += "\n    "
         status += "\n" + (" Status ").center(50, ':') + "\n"
@@ -143,7 +143,7 @@ else:
                             clientStatus["address"][1], 
                             clientStatus["address"][2], 
                             clientStatus["pid"], 
-                            "working on %s" % clientStatus["resourceid"] if (clientStatus["resourceid"]) else "waiting for new resource", 
+                            "working on %s" % ", ".join(["%s" % ID for ID in clientStatus["resourceids"]]) if (clientStatus["resourceids"]) else "waiting for new resource", 
                             clientStatus["time"]["lastrequest"].strftime("%d/%m/%Y %H:%M:%S") if (clientStatus["time"]["lastrequest"] is not None) else "-", 
                             clientStatus["amount"], 
                             #"" if (clientStatus["amount"] == 1) else "s",
@@ -188,8 +188,8 @@ else:
         connectedClients = float(len([client for client in clientsStatusList if client["threadstate"] == " "]))
         disconnectedClients = float(len([client for client in clientsStatusList if client["threadstate"] == "+"]))
         removingClients = float(len([client for client in clientsStatusList if client["threadstate"] == "-"]))
-        workingClients = float(len([client for client in clientsStatusList if (client["threadstate"] == " " and client["resourceid"])]))
-        waitingClients = float(len([client for client in clientsStatusList if (client["threadstate"] == " " and not client["resourceid"])]))
+        workingClients = float(len([client for client in clientsStatusList if (client["threadstate"] == " " and client["resourceids"])]))
+        waitingClients = float(len([client for client in clientsStatusList if (client["threadstate"] == " " and not client["resourceids"])]))
         connectedClientsPercent = ((connectedClients / clientsTotal) * 100) if (clientsTotal > 0) else 0.0
         disconnectedClientsPercent = ((disconnectedClients / clientsTotal) * 100) if (clientsTotal > 0) else 0.0
         removingClientsPercent = ((removingClients / clientsTotal) * 100) if (clientsTotal > 0) else 0.0
@@ -264,6 +264,13 @@ else:
         status += "      Average resources processed per client: %.2f\n" % avgResourcesPerclient
         status += "      Average resources processed per time unit: %.2f/h, %.2f/m, %.2f/s\n" % (avgResourcesPerSec * 3600, avgResourcesPerSec * 60, avgResourcesPerSec)
         
+        if (serverStatus["filters"]): 
+            status += "    Parallel filters jobs:\n"
+            for filterStatus in serverStatus["filters"]: 
+                status += "      %s: %d running, %d queued" % (filterStatus["name"], filterStatus["running"], filterStatus["queued"])
+                if (filterStatus["cache"]): status += ", %d cached (%d hits, %d misses)" % (filterStatus["cache"]["size"], filterStatus["cache"]["hits"], filterStatus["cache"]["misses"])
+                status += "\n"
+        
         status += "\n  " + (" Global Info ").center(46, '=') + "\n\n"
         status += "    Total number of resources: %d\n" % resourcesTotal
         status += "    Number of resources processed: %d (%.5f%%)\n" % (resourcesProcessed, resourcesProcessedPercent)
@@ -285,7 +292,7 @@ else:
                             clientStatus["clientid"], 
                             clientStatus["threadstate"], 
                             clientStatus["address"][0], 
-                            "working on %s" % clientStatus["resourceid"] if (clientStatus["resourceid"]) else "waiting for new resource", 
+                            "working on %s" % ", ".join(["%s" % ID for ID in clientStatus["resourceids"]]) if (clientStatus["resourceids"]) else "waiting for new resource", 
                             clientStatus["time"]["lastrequest"].strftime("%d/%m/%Y %H:%M:%S") if (clientStatus["time"]["lastrequest"] is not None) else "-"
                         )
         else:
@@ -7,19 +7,31 @@ Persistence handlers take care of all implementation details related to resource
 """
 
 import os
+import time
 import threading
+import array
 import tempfile
 import cStringIO
 import glob
 import re
 import json
 import csv
+import cPickle
+import itertools
+import gc
+import bisect
+import mmap
+import struct
+import shutil
 import Queue
+import sqlite3
 import common
 import mysql.connector
 from datetime import datetime
 from copy import deepcopy
 from collections import deque
+from functools import partial
+from contextlib import contextmanager
 
 
 class StatusCodes():
@@ -46,6 +58,9 @@ class BasePersistenceHandler():
         """
         self._extractConfig(configurationsDictionary)
         self.status = StatusCodes() 
+        self.availableEvent = threading.Event()
+        self.availableLock = threading.Lock()
+        self.availableListeners = []
         
     def _extractConfig(self, configurationsDictionary):
         """Extract and store configurations.
@@ -56,6 +71,25 @@ class BasePersistenceHandler():
         self.config = configurationsDictionary
         if ("echo" not in self.config): self.config["echo"] = {}
         
+    def _notifyAvailable(self):
+        """Wake up everyone waiting for new resources.
+        
+        Must be called by handlers every time resources are made ``AVAILABLE`` (by :meth:`insert`, :meth:`reset` or :meth:`update`, for example). 
+        
+        """
+        with self.availableLock: self.availableEvent.set()
+        for callback in self.availableListeners: callback()
+        
+    def _clearAvailable(self, noneAvailable):
+        """Record that there are no ``AVAILABLE`` resources, so that subsequent calls to :meth:`waitAvailable` block.
+        
+        Args:
+            * *noneAvailable* (function): Function without arguments that confirms there is no resource available. It is called while holding the same lock used by :meth:`_notifyAvailable`, so that notifications are not lost between the check and the actual clearing.
+        
+        """
+        with self.availableLock:
+            if (noneAvailable()): self.availableEvent.clear()
+            
     def setup(self):
         """Execute per client initialization procedures.
         
@@ -63,6 +97,28 @@ class BasePersistenceHandler():
         
         """
         pass
+        
+    def waitAvailable(self, timeout):
+        """Wait until new resources may have become ``AVAILABLE``.
+        
+        The server calls this method when there are no resources to give to a client and ``loopforever`` is set. Handlers that call :meth:`_notifyAvailable` wake up the waiting threads as soon as new resources arrive. For those that don't, the server just waits the whole *timeout* and then tries again.
+        
+        Args:
+            * *timeout* (float): Maximum number of seconds to wait.
+            
+        Returns:
+            ``True`` if resources may be available now, ``False`` if the timeout expired.
+        
+        """
+        return self.availableEvent.wait(timeout)
+        
+    def addAvailableListener(self, callback):
+        """Register a function to be called, without arguments, every time resources are made ``AVAILABLE``.
+        
+        The function is called by the thread that made the resources available, so it must return quickly.
+        
+        """
+        self.availableListeners.append(callback)
     
     def select(self): 
         """Retrive an ``AVAILABLE`` resource.
@@ -72,10 +128,29 @@ class BasePersistenceHandler():
         
             * *resourceKey* (user defined type): Value that uniquely identify the resource internally. It works like a primary key in relational databases and makes possible the existence of resources with the same ID, if needed.
             * *resourceID* (user defined type): Resource ID to be sent to a client.
-            * *resourceInfo* (dict): Other information related to the resource, if there is any.
+            * *resourceInfo* (dict): Other information related to the resource, if there is any. It must not be changed by the caller, as handlers may return the very same dictionary they keep in memory, without copying it.
         
         """
         return (None, None, None)
+        
+    def selectMany(self, amount): 
+        """Retrive up to *amount* ``AVAILABLE`` resources at once.
+        
+        The default implementation just calls :meth:`select` repeatedly. Handlers able to retrieve a whole batch of resources in a single operation should override it.
+        
+        Args: 
+            * *amount* (int): Maximum number of resources to be retrieved.
+        
+        Returns: 
+            A list of tuples in the same format returned by :meth:`select`. The list has less than *amount* elements (or is empty) if there are not enough resources available.
+        
+        """
+        resourcesList = []
+        while (len(resourcesList) < amount):
+            resource = self.select()
+            if (resource[0] is None): break
+            resourcesList.append(resource)
+        return resourcesList
     
     def update(self, resourceKey, status, resourceInfo): 
         """Update the specified resource, setting its status and information data to the ones given.
@@ -87,6 +162,17 @@ class BasePersistenceHandler():
             
         """
         pass
+        
+    def updateMany(self, resourcesList): 
+        """Update several resources at once.
+        
+        The default implementation just calls :meth:`update` for each resource. Handlers able to update a whole batch of resources in a single operation should override it.
+        
+        Args: 
+            * *resourcesList* (list): List of tuples in the format (*resourceKey*, *status*, *resourceInfo*), whose elements are the same as the arguments of :meth:`update`.
+            
+        """
+        for resourceKey, status, resourceInfo in resourcesList: self.update(resourceKey, status, resourceInfo)
     
     def insert(self, resourcesList): 
         """Insert new resources into the final location where resources are persisted.
@@ -139,16 +225,185 @@ class BasePersistenceHandler():
 # and for test purposes. Altough it can be set in the configuration file, it is not intended for direct use in a 
 # production enviroment. In this case, choose one of the file based handlers instead
 class MemoryPersistenceHandler(BasePersistenceHandler):
+    class KeysList():
+        """Doubly linked list of resource keys, supporting insertion and removal of any key in constant time.
+        
+        All lists of a handler share the same arrays of links, indexed by resource key, and the same lock. This is possible because keys are the positions of the resources in the handler's list and because each resource belongs to exactly one list (the one of its current status) at any point in time.
+        
+        """
+        def __init__(self, nextKeys, previousKeys, lock):
+            self.nextKeys = nextKeys
+            self.previousKeys = previousKeys
+            self.lock = lock
+            self.head = -1
+            self.tail = -1
+            self.size = 0
+            
+        def _reserve(self, key):
+            if (key >= len(self.nextKeys)):
+                self.nextKeys.extend([-1] * (key + 1 - len(self.nextKeys)))
+                self.previousKeys.extend([-1] * (key + 1 - len(self.previousKeys)))
+                
+        def _remove(self, key):
+            previousKey = self.previousKeys[key]
+            nextKey = self.nextKeys[key]
+            if (previousKey == -1): self.head = nextKey
+            else: self.nextKeys[previousKey] = nextKey
+            if (nextKey == -1): self.tail = previousKey
+            else: self.previousKeys[nextKey] = previousKey
+            self.size -= 1
+        
+        def append(self, key):
+            with self.lock:
+                self._reserve(key)
+                self.previousKeys[key] = self.tail
+                self.nextKeys[key] = -1
+                if (self.tail == -1): self.head = key
+                else: self.nextKeys[self.tail] = key
+                self.tail = key
+                self.size += 1
+            
+        def appendleft(self, key):
+            with self.lock:
+                self._reserve(key)
+                self.previousKeys[key] = -1
+                self.nextKeys[key] = self.head
+                if (self.head == -1): self.tail = key
+                else: self.previousKeys[self.head] = key
+                self.head = key
+                self.size += 1
+            
+        def remove(self, key):
+            with self.lock: self._remove(key)
+            
+        def popleft(self):
+            with self.lock:
+                if (self.head == -1): raise IndexError("pop from an empty list")
+                key = self.head
+                self._remove(key)
+                return key
+            
+        def __len__(self): 
+            return self.size
+            
+        def __iter__(self):
+            # Iterate over a copy, so that the list can be changed during the iteration
+            keys = []
+            with self.lock:
+                key = self.head
+                while (key != -1):
+                    keys.append(key)
+                    key = self.nextKeys[key]
+            return iter(keys)
+            
+    class ResourcesList(list):
+        """Default resources store: a list of dictionaries in the format ``{"id": resourceID, "status": status, "info": resourceInfo}``."""
+        
+        def getID(self, pk): 
+            return self[pk]["id"]
+            
+        def getStatus(self, pk): 
+            return self[pk]["status"]
+            
+        def getInfo(self, pk): 
+            return self[pk]["info"]
+            
+        def save(self, pk, status, info, changeInfo):
+            if (status is not None): self[pk]["status"] = status
+            if (changeInfo): 
+                if (self[pk]["info"] is not None) and (info is not None): self[pk]["info"].update(info)
+                else: self[pk]["info"] = info
+                
+    class CompactResourcesList():
+        """Column oriented resources store, for datasets too large to be kept in memory as a list of dictionaries.
+        
+        IDs and status codes are kept in typed arrays. Each info column holds, for every resource, an index into a table of the distinct values found in that column, so that repeated values are stored just once. The resource dictionaries are built only when requested, having the same format used by :class:`ResourcesList <MemoryPersistenceHandler.ResourcesList>`.
+        
+        """
+        def __init__(self):
+            self.ids = array.array("l")
+            self.statuses = array.array("i")
+            self.hasInfo = array.array("b")
+            self.columns = {}
+            
+        def _appendID(self, id):
+            # Non integer IDs (or integers too big to fit in the array) make the store fall back to a list of IDs
+            try: self.ids.append(id)
+            except (TypeError, OverflowError): 
+                if (isinstance(self.ids, list)): raise
+                self.ids = self.ids.tolist()
+                self.ids.append(id)
+            
+        def _setInfoValue(self, pk, name, value):
+            if (name not in self.columns): self.columns[name] = (array.array("i", [-1]) * len(self.statuses), [], {})
+            (indexes, values, valuesIndexes) = self.columns[name]
+            try: 
+                if (value not in valuesIndexes): 
+                    valuesIndexes[value] = len(values)
+                    values.append(value)
+                indexes[pk] = valuesIndexes[value]
+            except TypeError: 
+                # Unhashable values cannot be shared
+                indexes[pk] = len(values)
+                values.append(value)
+                
+        def _setInfo(self, pk, info, replace):
+            if (replace):
+                self.hasInfo[pk] = (info is not None)
+                for (indexes, values, valuesIndexes) in self.columns.values(): indexes[pk] = -1
+            if (info is not None):
+                for name, value in info.iteritems(): self._setInfoValue(pk, name, value)
+            
+        def append(self, resource):
+            self._appendID(resource["id"])
+            self.statuses.append(resource["status"])
+            self.hasInfo.append(False)
+            for (indexes, values, valuesIndexes) in self.columns.values(): indexes.append(-1)
+            self._setInfo(len(self.statuses) - 1, resource["info"], True)
+            
+        def extend(self, resourcesList):
+            for resource in resourcesList: self.append(resource)
+            
+        def getID(self, pk): 
+            return self.ids[pk]
+            
+        def getStatus(self, pk): 
+            return self.statuses[pk]
+            
+        def getInfo(self, pk): 
+            if (not self.hasInfo[pk]): return None
+            info = {}
+            for name, (indexes, values, valuesIndexes) in self.columns.items():
+                if (indexes[pk] != -1): info[name] = values[indexes[pk]]
+            return info
+            
+        def save(self, pk, status, info, changeInfo):
+            if (status is not None): self.statuses[pk] = status
+            if (changeInfo): self._setInfo(pk, info, (not self.hasInfo[pk]) or (info is None))
+                
+        def __len__(self): 
+            return len(self.statuses)
+            
+        def __getitem__(self, pk):
+            if (pk < 0): pk += len(self.statuses)
+            if (pk < 0) or (pk >= len(self.statuses)): raise IndexError("list index out of range")
+            return {"id": self.ids[pk], "status": self.statuses[pk], "info": self.getInfo(pk)}
+            
+        def __iter__(self):
+            for pk in xrange(len(self.statuses)): yield self[pk]
+
     def __init__(self, configurationsDictionary): 
         BasePersistenceHandler.__init__(self, configurationsDictionary)
         self.insertLock = threading.Lock()
-        self.resources = []
+        if (self.config["store"] == "compact"): self.resources = MemoryPersistenceHandler.CompactResourcesList()
+        else: self.resources = MemoryPersistenceHandler.ResourcesList()
         self.IDsHash = {}
-        self.statusRecords = {self.status.SUCCEEDED:  [],
-                              self.status.INPROGRESS: [],
-                              self.status.AVAILABLE:  deque(), 
-                              self.status.FAILED:     [],
-                              self.status.ERROR:      []}
+        linksData = (array.array("l"), array.array("l"), threading.Lock())
+        self.statusRecords = {self.status.SUCCEEDED:  MemoryPersistenceHandler.KeysList(*linksData),
+                              self.status.INPROGRESS: MemoryPersistenceHandler.KeysList(*linksData),
+                              self.status.AVAILABLE:  MemoryPersistenceHandler.KeysList(*linksData), 
+                              self.status.FAILED:     MemoryPersistenceHandler.KeysList(*linksData),
+                              self.status.ERROR:      MemoryPersistenceHandler.KeysList(*linksData)}
         #self._loadTestData()
             
     def _extractConfig(self, configurationsDictionary):
@@ -160,15 +415,25 @@ class MemoryPersistenceHandler(BasePersistenceHandler):
         if ("onduplicateupdate" not in self.config): self.config["onduplicateupdate"] = False
         else: self.config["onduplicateupdate"] = common.str2bool(self.config["onduplicateupdate"])
         
+        if ("store" not in self.config): self.config["store"] = "list"
+        else: self.config["store"] = self.config["store"].lower()
+        if (self.config["store"] not in ("list", "compact")): raise ValueError("Unknow value '%s' for parameter 'store'." % self.config["store"])
+        
     def _save(self, pk, id, status, info, changeInfo = True):
         if (pk is not None):
-            if (status is not None): self.resources[pk]["status"] = status
-            if (changeInfo): 
-                if (self.resources[pk]["info"] is not None) and (info is not None): self.resources[pk]["info"].update(info)
-                else: self.resources[pk]["info"] = info
+            self.resources.save(pk, status, info, changeInfo)
         else: 
             self.resources.append({"id": id, "status": status, "info": info})
             
+    def _saveMany(self, recordsList):
+        for pk, status, info, changeInfo in recordsList: MemoryPersistenceHandler._save(self, pk, None, status, info, changeInfo)
+        
+    def _insertMany(self, resourcesList):
+        self.resources.extend(resourcesList)
+        
+    def _duplicatedIDMessage(self, resourceID):
+        return "Cannot insert resource, ID %s already exists." % resourceID
+
     def _loadTestData(self):
         self.resources.extend([
             {"id": 1, "status": 0, "info": {"crawler_name": "c1", "response_code": 3}},
@@ -182,31 +447,74 @@ class MemoryPersistenceHandler(BasePersistenceHandler):
                 if (resource["id"] not in self.IDsHash): self.IDsHash[resource["id"]] = pk
                 else: raise KeyError("Duplicated ID found in resources list: %s." % resource["id"])
     
+    def _noneAvailable(self):
+        return (not self.statusRecords[self.status.AVAILABLE])
+    
     def select(self): 
         try: pk = self.statusRecords[self.status.AVAILABLE].popleft()
-        except IndexError: return (None, None, None)
+        except IndexError: 
+            self._clearAvailable(self._noneAvailable)
+            return (None, None, None)
         self._save(pk, None, self.status.INPROGRESS, None, False)
         self.statusRecords[self.status.INPROGRESS].append(pk)
-        return (pk, self.resources[pk]["id"], deepcopy(self.resources[pk]["info"]))
+        return (pk, self.resources.getID(pk), self.resources.getInfo(pk))
+
+    def selectMany(self, amount):
+        pksList = []
+        try:
+            while (len(pksList) < amount): pksList.append(self.statusRecords[self.status.AVAILABLE].popleft())
+        except IndexError: self._clearAvailable(self._noneAvailable)
+        self._saveMany([(pk, self.status.INPROGRESS, None, False) for pk in pksList])
+        for pk in pksList: self.statusRecords[self.status.INPROGRESS].append(pk)
+        return [(pk, self.resources.getID(pk), self.resources.getInfo(pk)) for pk in pksList]
     
     def update(self, resourceKey, status, resourceInfo): 
-        currentStatus = self.resources[resourceKey]["status"]
+        currentStatus = self.resources.getStatus(resourceKey)
         self.statusRecords[currentStatus].remove(resourceKey)
         if (resourceInfo): self._save(resourceKey, None, status, resourceInfo)
         else: self._save(resourceKey, None, status, resourceInfo, False)
         self.statusRecords[status].append(resourceKey)
-        
+        if (status == self.status.AVAILABLE): self._notifyAvailable()
+        
+    def updateMany(self, resourcesList):
+        for resourceKey, status, resourceInfo in resourcesList:
+            self.statusRecords[self.resources.getStatus(resourceKey)].remove(resourceKey)
+        self._saveMany([(resourceKey, status, resourceInfo, bool(resourceInfo)) for resourceKey, status, resourceInfo in resourcesList])
+        for resourceKey, status, resourceInfo in resourcesList: self.statusRecords[status].append(resourceKey)
+        if (any(status == self.status.AVAILABLE for resourceKey, status, resourceInfo in resourcesList)): self._notifyAvailable()
+
     def insert(self, resourcesList): 
-        for resourceID, resourceInfo in resourcesList:
-            if (self.config["uniqueresourceid"]) and (resourceID in self.IDsHash):
-                if (self.config["onduplicateupdate"]): 
-                    self._save(self.IDsHash[resourceID], None, None, resourceInfo)
-                    continue
-                else: raise KeyError("Cannot insert resource, ID %s already exists." % resourceID)
-            with self.insertLock:
-                self.statusRecords[self.status.AVAILABLE].append(len(self.resources))
-                if (self.config["uniqueresourceid"]): self.IDsHash[resourceID] = len(self.resources)
-                self._save(None, resourceID, self.status.AVAILABLE, resourceInfo)
+        # All resources are checked for duplicated IDs before saving anything, so that new resources are saved at once
+        with self.insertLock:
+            newResourcesList = []
+            newIDs = {}
+            updatesList = []
+            for resourceID, resourceInfo in resourcesList:
+                if (self.config["uniqueresourceid"]): 
+                    if (resourceID in self.IDsHash) or (resourceID in newIDs):
+                        if (not self.config["onduplicateupdate"]): raise KeyError(self._duplicatedIDMessage(resourceID))
+                        if (resourceID in self.IDsHash): updatesList.append((self.IDsHash[resourceID], None, resourceInfo, True))
+                        else: 
+                            # Resource repeated in the list itself, info is updated in the same way ResourcesList.save does
+                            newResource = newResourcesList[newIDs[resourceID]]
+                            if (newResource["info"] is not None) and (resourceInfo is not None): 
+                                newResource["info"] = dict(newResource["info"])
+                                newResource["info"].update(resourceInfo)
+                            else: newResource["info"] = resourceInfo
+                        continue
+                    newIDs[resourceID] = len(newResourcesList)
+                newResourcesList.append({"id": resourceID, "status": self.status.AVAILABLE, "info": resourceInfo})
+                
+            if (updatesList): self._saveMany(updatesList)
+            if (not newResourcesList): return
+            
+            # Keys are made available only after the resources are saved, as they may be selected right away
+            firstKey = len(self.resources)
+            if (self.config["uniqueresourceid"]): 
+                for resourceID, index in newIDs.iteritems(): self.IDsHash[resourceID] = firstKey + index
+            self._insertMany(newResourcesList)
+            for pk in xrange(firstKey, firstKey + len(newResourcesList)): self.statusRecords[self.status.AVAILABLE].append(pk)
+        self._notifyAvailable()
         
     def count(self): 
         return (len(self.resources), 
@@ -217,20 +525,25 @@ class MemoryPersistenceHandler(BasePersistenceHandler):
                 len(self.statusRecords[self.status.ERROR]))
         
     def reset(self, status): 
-        resetList = self.statusRecords[status][:]
+        resetList = list(self.statusRecords[status])
         for pk in resetList:
             self.statusRecords[status].remove(pk)
             self._save(pk, None, self.status.AVAILABLE, None, False)
             self.statusRecords[self.status.AVAILABLE].appendleft(pk)
+        if (resetList): self._notifyAvailable()
         return len(resetList)
             
         
 class FilePersistenceHandler(MemoryPersistenceHandler):
     """Load and dump resources from/to a file.
     
-    All resources in the file are loaded into memory before the server operations begin. So, this handler is recomended for small to medium size datasets that can be completely fitted into machine's memory. For larger datasets, consider using another persistence handler. Another option for large datasets is to divide the resources in more than one file, collecting the resources of one file at a time.
+    All resources in the file are loaded into memory before the server operations begin. So, this handler is recomended for small to medium size datasets that can be completely fitted into machine's memory. For larger datasets, consider using another persistence handler, like :class:`SQLitePersistenceHandler`. Another option for large datasets is to divide the resources in more than one file, collecting the resources of one file at a time.
     
-    The default version of this handler supports CSV and JSON files. It is possible to add support to other file types by subclassing :class:`BaseFileColumns` and :class:`BaseFileHandler`. The new file type must also be included in  the :attr:`supportedFileTypes` dictionary.
+    By default, the whole file is rewritten every ``savetimedelta`` seconds. When the ``journal`` option is enabled, changes are appended to a journal file (named after the resources file, with the ``.journal`` suffix) instead, which is flushed every ``savetimedelta`` seconds. The resources file is rewritten (and the journal emptied) only when the journal grows beyond ``journalthreshold`` bytes and at shutdown. On startup, any journal left behind is replayed on top of the resources file. In both cases, the file is written from a consistent snapshot of the resources taken at the beginning of the dump, without stopping the server while the file is being written.
+    
+    Setting the ``store`` option to ``compact`` makes the handler keep resources in memory in a column oriented structure (see :class:`CompactResourcesList <MemoryPersistenceHandler.CompactResourcesList>`), which takes much less space than the default list of dictionaries when there are many resources sharing the same information values.
+    
+    The default version of this handler supports CSV, JSON, JSONL (one JSON object per line) and BIN (see :class:`BinaryHandler`) files. It is possible to add support to other file types by subclassing :class:`BaseFileColumns` and :class:`BaseFileHandler`. The new file type must also be included in  the :attr:`supportedFileTypes` dictionary.
     
     """
     class BaseFileColumns():
@@ -259,6 +572,9 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
         Each resource loaded from a file is stored in memory in a dictionary in the format ``{"id": X, "status": X, "info": {...}}``, which is the resource internal representation format. This handler is responsible for translating resources in the internal representation format to the format used in a specific file type and vice-versa.
         
         """
+        fileMode = ""
+        """Mode flag added to the mode used to open files (``"b"`` for binary files, for example)."""
+        
         def __init__(self): self.status = StatusCodes() 
         
         def parse(self, resource, columns): 
@@ -368,24 +684,81 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
             writer.writerow(unparsed)
             return buffer.getvalue()
             
+        def _parseColumn(self, values, parsers):
+            # Try to parse the whole column with the same parser, which is much faster than checking the type of 
+            # each value separately. The parser that succeeds is moved to the front, to be tried first next time
+            for parser in parsers:
+                try: parsedValues = parser(values)
+                except ValueError: continue
+                parsers.remove(parser)
+                parsers.insert(0, parser)
+                return parsedValues
+            # Let the error of the invalid value be raised
+            return self._parseAnyColumn(values)
+        
+        def _parseIntColumn(self, values):
+            return [(int(value) if (value) else None) for value in values]
+            
+        def _parseNumberColumn(self, values):
+            return [(((float(value) if ("." in value) else int(value))) if (value) else None) for value in values]
+            
+        def _parseAnyColumn(self, values):
+            return [self._parseValue(value) for value in values]
+            
         def load(self, file, columns):
-            reader = csv.DictReader(file, columns.names, quoting = csv.QUOTE_MINIMAL, quotechar = "'", skipinitialspace = True)
-            next(reader)
-            for resource in reader:
-                yield self.parse(resource, columns)
+            # Resources are parsed in chunks, column by column. The result is exactly the same of parsing each resource with parse()
+            reader = csv.reader(file, quoting = csv.QUOTE_MINIMAL, quotechar = "'", skipinitialspace = True)
+            header = next(reader)
+            while (header == []): header = next(reader)
+            columnsAmount = len(columns.names)
+            idIndex = columns.names.index(columns.idName)
+            statusIndex = (columns.names.index(columns.statusName) if (columns.statusName in columns.names) else None)
+            infoIndexes = [columns.names.index(name) for name in columns.infoNames]
+            columnsParsers = [[self._parseIntColumn, self._parseNumberColumn, self._parseAnyColumn] for i in range(columnsAmount)]
+            while True:
+                rows = [row for row in itertools.islice(reader, 10000) if (row != [])]
+                if (not rows): break
+                for i, row in enumerate(rows):
+                    if (len(row) != columnsAmount): rows[i] = (row + [""] * (columnsAmount - len(row)))[:columnsAmount]
+                rawColumns = zip(*rows)
+                ids = self._parseColumn(rawColumns[idIndex], columnsParsers[idIndex])
+                if (statusIndex is None): statuses = itertools.repeat(self.status.AVAILABLE)
+                else: 
+                    statuses = self._parseColumn(rawColumns[statusIndex], columnsParsers[statusIndex])
+                    statuses = [(status if (value) else self.status.AVAILABLE) for value, status in itertools.izip(rawColumns[statusIndex], statuses)]
+                if (infoIndexes): 
+                    infoRows = zip(*[self._parseColumn(rawColumns[index], columnsParsers[index]) for index in infoIndexes])
+                    for id, status, infoValues in itertools.izip(ids, statuses, infoRows): 
+                        yield {"id": id, "status": status, "info": dict(itertools.izip(columns.infoNames, infoValues))}
+                else:
+                    for id, status in itertools.izip(ids, statuses): 
+                        yield {"id": id, "status": status}
         
         def dump(self, resources, file, columns):
-            writer = csv.DictWriter(file, columns.names, quoting = csv.QUOTE_MINIMAL, quotechar = "'", lineterminator = "\n", extrasaction = "ignore")
-            writer.writeheader()
-            # In case of CSV, it is easier and faster to unparse the resource here instead of using 
-            # unparse method, so we can use writerow method to directly save the resource to file
+            writer = csv.writer(file, quoting = csv.QUOTE_MINIMAL, quotechar = "'", lineterminator = "\n")
+            writer.writerow(columns.names)
+            # In case of CSV, it is easier and faster to unparse the resource here instead of using unparse
+            # method, building the rows directly as lists, in the order of the columns, and writing them in chunks
+            columnsAmount = len(columns.names)
+            idIndex = columns.names.index(columns.idName)
+            statusIndex = (columns.names.index(columns.statusName) if (columns.statusName in columns.names) else None)
+            infoColumns = [(columns.names.index(name), name) for name in columns.infoNames]
+            unparseValue = self._unparseValue
+            rows = []
             for resource in resources:
-                row = {columns.idName: self._unparseValue(resource["id"])}
-                if (resource["status"] != 0): row[columns.statusName] = self._unparseValue(resource["status"])
-                if (resource["info"]):
-                    for key, value in resource["info"].iteritems():
-                        if (value is not None) and (key in columns.infoNames): row[key] = self._unparseValue(value)
-                writer.writerow(row)
+                row = [""] * columnsAmount
+                row[idIndex] = unparseValue(resource["id"])
+                if (statusIndex is not None) and (resource["status"] != 0): row[statusIndex] = unparseValue(resource["status"])
+                info = resource["info"]
+                if (info):
+                    for index, name in infoColumns: 
+                        value = info.get(name)
+                        if (value is not None): row[index] = (value if (type(value) in (int, long, float)) else unparseValue(value))
+                rows.append(row)
+                if (len(rows) == 10000): 
+                    writer.writerows(rows)
+                    rows = []
+            writer.writerows(rows)
         
     class JSONColumns(BaseFileColumns):
         """Hold column names of data in JSON files, allowing fast access to names of ID, status and info columns."""
@@ -425,10 +798,43 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
                     if (value is not None) and (key in columns.infoNames): unparsed[key] = value
             return json.dumps(unparsed)
     
+        def _readMore(self, file, buffer, position):
+            chunk = file.read(65536)
+            if (not chunk): raise ValueError("Unexpected end of JSON file '%s'." % file.name)
+            return (buffer[position:] + chunk, 0)
+            
+        def _skipWhitespace(self, file, buffer, position):
+            # Move position to the next non-whitespace character, reading more data while there is only whitespace left in the buffer
+            while True:
+                position = re.compile(r"\s*").match(buffer, position).end()
+                if (position < len(buffer)): return (buffer, position)
+                (buffer, position) = self._readMore(file, buffer, position)
+    
         def load(self, file, columns): 
-            input = json.load(file)
-            for resource in input["resources"]: 
+            # Parse the resources list incrementally, one resource at a time, instead of loading the whole document at once
+            decoder = json.JSONDecoder()
+            resourcesStart = re.compile(r'"resources"\s*:\s*\[\s*')
+            resourceEnd = re.compile(r'\s*(,|\])\s*')
+            (buffer, position) = self._readMore(file, "", 0)
+            match = resourcesStart.search(buffer)
+            while (not match): 
+                (buffer, position) = self._readMore(file, buffer, max(0, len(buffer) - 32))
+                match = resourcesStart.search(buffer)
+            (buffer, position) = self._skipWhitespace(file, buffer, match.end())
+            if (buffer[position] == "]"): return
+            while True:
+                # Read more data if the resource is incomplete or if it is not possible to tell yet what comes next
+                (buffer, position) = self._skipWhitespace(file, buffer, position)
+                try: 
+                    (resource, resourceEndPosition) = decoder.raw_decode(buffer, position)
+                    match = resourceEnd.match(buffer, resourceEndPosition)
+                    if (not match) or (match.end() == len(buffer)): raise ValueError("Incomplete resource.")
+                except ValueError: 
+                    (buffer, position) = self._readMore(file, buffer, position)
+                    continue
                 yield self.parse(resource, columns)
+                if (match.group(1) == "]"): break
+                position = match.end()
 
         def dump(self, resources, file, columns):
             file.write("{\"columns\": %s, \"resources\": [" % json.dumps(columns.names))
@@ -438,10 +844,205 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
                 separator = ", "
             file.write("]}")
             
+    class JSONLColumns(BaseFileColumns):
+        """Hold column names of data in JSONL files, allowing fast access to names of ID, status and info columns. Column names are given by the first line of the file, as a JSON list."""
+    
+        def _extractColNames(self, fileName):
+            with open(fileName, "r") as file: return json.loads(file.readline())
+            
+    class JSONLHandler(JSONHandler):
+        """Handle low level details about persistence in JSONL files.
+        
+        The first line of the file holds the list of column names and each of the following lines holds a resource, in the same format used by :class:`JSONHandler <FilePersistenceHandler.JSONHandler>`. This way, files can be read line by line and new resources can be added just by appending lines to the file.
+        
+        """
+        def load(self, file, columns): 
+            next(file)
+            for line in file: 
+                if (line.strip()): yield self.parse(json.loads(line), columns)
+                
+        def dump(self, resources, file, columns):
+            file.write("%s\n" % json.dumps(columns.names))
+            for resource in resources: file.write("%s\n" % self.unparse(resource, columns))
+            
+    class BinaryColumns(BaseFileColumns):
+        """Hold column names of data in binary files, allowing fast access to names of ID, status and info columns."""
+    
+        def _extractColNames(self, fileName):
+            with open(fileName, "rb") as file: 
+                header = file.read(12)
+                if (header[:8] != FilePersistenceHandler.BinaryHandler.magic): raise TypeError("File '%s' is not a valid binary resources file." % fileName)
+                return json.loads(file.read(struct.unpack("<I", header[8:])[0]))
+                
+    class BinaryHandler(BaseFileHandler):
+        """Handle low level details about persistence in binary files.
+        
+        Binary files are made of a header (holding the column names and the number of resources), followed by the status codes of all resources (one signed byte each), the offsets of the records of all resources (one 8 bytes integer each) and the records themselves (the ID and information of each resource, pickled). Status codes and offsets have fixed width, so the file is not loaded into memory, but mapped instead (see :class:`BinaryResourcesList <FilePersistenceHandler.BinaryResourcesList>`). Changes of status are made directly in the file, changes of information are written as new records at the end of the file, and records are read only when needed.
+        
+        """
+        magic = "CAMPSBIN"
+        fileMode = "b"
+        
+        def parse(self, resource, columns):
+            # Resources in file format are tuples (ID, status, info)
+            parsed = {"id": resource[0], "status": resource[1]}
+            if (columns.infoNames): 
+                info = resource[2] or {}
+                parsed["info"] = {name: info.get(name) for name in columns.infoNames}
+            return parsed
+            
+        def unparse(self, resource, columns):
+            info = resource["info"] or {}
+            return cPickle.dumps((resource["id"], {name: info[name] for name in columns.infoNames if (info.get(name) is not None)}), 2)
+            
+        def readHeader(self, file):
+            # Return the number of resources and the position where the status codes begin
+            columnsLength = struct.unpack("<I", file.read(12)[8:])[0]
+            file.seek(columnsLength, 1)
+            amount = struct.unpack("<q", file.read(8))[0]
+            return (amount, 20 + columnsLength)
+            
+        def load(self, file, columns): 
+            # Records are usually in the same order of the resources, but those changed in place are at the end of the file
+            (amount, statusesStart) = self.readHeader(file)
+            statuses = array.array("b", file.read(amount))
+            offsetsStart = statusesStart + amount
+            for start in xrange(0, amount, 10000):
+                chunkSize = min(10000, amount - start)
+                file.seek(offsetsStart + start * 8)
+                offsets = struct.unpack("<%dq" % chunkSize, file.read(chunkSize * 8))
+                for status, offset in itertools.izip(statuses[start:start + chunkSize], offsets):
+                    if (file.tell() != offset): file.seek(offset)
+                    (id, info) = cPickle.loads(file.read(struct.unpack("<I", file.read(4))[0]))
+                    yield self.parse((id, status, info), columns)
+        
+        def dump(self, resources, file, columns):
+            # Records are written to a temporary file first, as the number of resources is not known in advance
+            statuses = array.array("b")
+            lengths = array.array("l")
+            with tempfile.TemporaryFile() as records:
+                for resource in resources:
+                    record = self.unparse(resource, columns)
+                    records.write(struct.pack("<I", len(record)))
+                    records.write(record)
+                    statuses.append(resource["status"])
+                    lengths.append(len(record) + 4)
+                encodedColumns = json.dumps(columns.names)
+                file.write(self.magic)
+                file.write(struct.pack("<I", len(encodedColumns)))
+                file.write(encodedColumns)
+                file.write(struct.pack("<q", len(statuses)))
+                file.write(statuses.tostring())
+                offset = 20 + len(encodedColumns) + len(statuses) * 9
+                for start in xrange(0, len(lengths), 10000):
+                    chunk = lengths[start:start + 10000]
+                    offsets = []
+                    for length in chunk: 
+                        offsets.append(offset)
+                        offset += length
+                    file.write(struct.pack("<%dq" % len(offsets), *offsets))
+                records.seek(0)
+                shutil.copyfileobj(records, file)
+                
+        def openStore(self, fileName, columns):
+            return FilePersistenceHandler.BinaryResourcesList(fileName, columns, self)
+                
+    class BinaryResourcesList():
+        """Resources store backed by a binary file mapped in memory.
+        
+        Status codes are read and written directly from/to the file, while IDs and information are read from the file only when requested. When the information of a resource changes, a new record is written at the end of the file and the offset of the resource is pointed to it, leaving the old record as garbage. New resources are kept in memory until the file is rewritten, which also happens when garbage takes more than half of the file. This store has the same interface of :class:`ResourcesList <MemoryPersistenceHandler.ResourcesList>`.
+        
+        """
+        def __init__(self, fileName, columns, fileHandler):
+            self.fileHandler = fileHandler
+            self.columns = columns
+            self.file = open(fileName, "r+b")
+            (self.size, self.statusesStart) = fileHandler.readHeader(self.file)
+            self.offsetsStart = self.statusesStart + self.size
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            # Only garbage left by this store is counted. Garbage left by previous runs is removed by the next rewrite
+            self.garbageSize = 0
+            self.appended = MemoryPersistenceHandler.ResourcesList()
+            
+        def _record(self, pk):
+            offset = struct.unpack_from("<q", self.map, self.offsetsStart + pk * 8)[0]
+            length = struct.unpack_from("<I", self.map, offset)[0]
+            return cPickle.loads(self.map[offset + 4:offset + 4 + length])
+            
+        def _rewriteRecord(self, pk, id, info):
+            # The record is written before its offset is changed, so that the file is consistent at any time
+            offsetPosition = self.offsetsStart + pk * 8
+            oldOffset = struct.unpack_from("<q", self.map, offsetPosition)[0]
+            self.garbageSize += struct.unpack_from("<I", self.map, oldOffset)[0] + 4
+            record = self.fileHandler.unparse({"id": id, "info": info}, self.columns)
+            offset = len(self.map)
+            self.map.resize(offset + len(record) + 4)
+            self.map[offset:offset + len(record) + 4] = struct.pack("<I", len(record)) + record
+            struct.pack_into("<q", self.map, offsetPosition, offset)
+            
+        def append(self, resource):
+            self.appended.append(resource)
+            
+        def extend(self, resourcesList):
+            self.appended.extend(resourcesList)
+            
+        def getID(self, pk): 
+            if (pk >= self.size): return self.appended.getID(pk - self.size)
+            return self._record(pk)[0]
+            
+        def getStatus(self, pk): 
+            if (pk >= self.size): return self.appended.getStatus(pk - self.size)
+            status = ord(self.map[self.statusesStart + pk])
+            return (status - 256 if (status > 127) else status)
+            
+        def getInfo(self, pk): 
+            if (pk >= self.size): return self.appended.getInfo(pk - self.size)
+            (id, info) = self._record(pk)
+            return self.fileHandler.parse((id, None, info), self.columns).get("info")
+            
+        def save(self, pk, status, info, changeInfo):
+            if (pk >= self.size): 
+                self.appended.save(pk - self.size, status, info, changeInfo)
+                return
+            if (status is not None): 
+                if (status < -128) or (status > 127): raise ValueError("Status code %s cannot be saved in a binary file." % status)
+                self.map[self.statusesStart + pk] = chr(status & 0xFF)
+            if (changeInfo): 
+                (id, currentInfo) = self._record(pk)
+                if (currentInfo is not None) and (info is not None): 
+                    currentInfo = dict(currentInfo)
+                    currentInfo.update(info)
+                else: currentInfo = info
+                self._rewriteRecord(pk, id, currentInfo)
+                
+        def isDirty(self):
+            # Tell whether the file must be rewritten, either to save new resources or to get rid of garbage
+            return bool(self.appended) or (self.garbageSize * 2 > len(self.map))
+            
+        def flush(self):
+            self.map.flush()
+            
+        def close(self):
+            self.map.close()
+            self.file.close()
+                
+        def __len__(self): 
+            return self.size + len(self.appended)
+            
+        def __getitem__(self, pk):
+            if (pk < 0): pk += len(self)
+            if (pk < 0) or (pk >= len(self)): raise IndexError("list index out of range")
+            return {"id": self.getID(pk), "status": self.getStatus(pk), "info": self.getInfo(pk)}
+            
+        def __iter__(self):
+            for pk in xrange(len(self)): yield self[pk]
+            
     supportedFileTypes = {
                          # Type   : [FileColumns, FileHandler]
                            "CSV"  : ["CSVColumns", "CSVHandler"],
-                           "JSON" : ["JSONColumns", "JSONHandler"]
+                           "JSON" : ["JSONColumns", "JSONHandler"],
+                           "JSONL": ["JSONLColumns", "JSONLHandler"],
+                           "BIN"  : ["BinaryColumns", "BinaryHandler"]
                          }
     """Associate file types and its columns and handler classes. The type of the current file is provided by the user directly (through the ``filetype`` option in the XML configuration file) or indirectly (through the file extension extracted from file name). When checking if the type of the current file is on the list of supported file types, the comparison between the strings is case insensitive."""
                          
@@ -449,18 +1050,40 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
         MemoryPersistenceHandler.__init__(self, configurationsDictionary)
         self.echo = common.EchoHandler(self.config["echo"])
         self.saveLock = threading.Lock()
+        self.dumpLock = threading.Lock()
         self.dumpExceptionEvent = threading.Event()
+        self.dumpSnapshot = None
+        self.dumpChanged = None
 
         self._setFileHandler()
-        with open(self.config["filename"], "r") as inputFile:
-            resourcesList = self.fileHandler.load(inputFile, self.fileColumns)
-            for resource in resourcesList:
-                self.statusRecords[resource["status"]].append(len(self.resources))
-                if (self.config["uniqueresourceid"]): 
-                    if (resource["id"] not in self.IDsHash): self.IDsHash[resource["id"]] = len(self.resources)
-                    else: raise KeyError("Duplicated ID found in '%s': %s." % (self.config["filename"], resource["id"])) 
-                if ("info" not in resource): resource["info"] = None
-                self.resources.append(resource)
+        # Files that can be mapped in memory (binary files, for example) are not loaded at all
+        if (hasattr(self.fileHandler, "openStore")): 
+            self.resources = self.fileHandler.openStore(self.config["filename"], self.fileColumns)
+        else: 
+            # Loading creates lots of objects that are never garbage, so there is no point in letting 
+            # the cyclic garbage collector run over and over again while the file is being loaded
+            gcEnabled = gc.isenabled()
+            gc.disable()
+            try:
+                with open(self.config["filename"], "r" + self.fileHandler.fileMode) as inputFile:
+                    resourcesList = self.fileHandler.load(inputFile, self.fileColumns)
+                    for resource in resourcesList:
+                        if ("info" not in resource): resource["info"] = None
+                        self.resources.append(resource)
+            finally:
+                if (gcEnabled): gc.enable()
+                
+        if (self.config["journal"]): 
+            self.journalFileName = self.config["filename"] + ".journal"
+            self._replayJournal()
+            self.journalFile = open(self.journalFileName, "ab")
+            
+        for pk in xrange(len(self.resources)):
+            self.statusRecords[self.resources.getStatus(pk)].append(pk)
+            if (self.config["uniqueresourceid"]): 
+                resourceID = self.resources.getID(pk)
+                if (resourceID not in self.IDsHash): self.IDsHash[resourceID] = pk
+                else: raise KeyError("Duplicated ID found in '%s': %s." % (self.config["filename"], resourceID)) 
 
         self.timer = threading.Timer(self.config["savetimedelta"], self._dumpTimerThread)
         self.timer.daemon = True
@@ -474,9 +1097,65 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
         
         self.config["savetimedelta"] = int(self.config["savetimedelta"])
         if (self.config["savetimedelta"] < 1): raise ValueError("Parameter 'savetimedelta' must be greater than zero.")
+        
+        if ("journal" not in self.config): self.config["journal"] = False
+        else: self.config["journal"] = common.str2bool(self.config["journal"])
+        
+        if ("journalthreshold" not in self.config): self.config["journalthreshold"] = 64 * 1024 * 1024
+        else: self.config["journalthreshold"] = int(self.config["journalthreshold"])
+        if (self.config["journalthreshold"] < 1): raise ValueError("Parameter 'journalthreshold' must be greater than zero.")
+        
+    def _journal(self, pk, id, status, info, changeInfo, insertOffset = 0):
+        # Inserted resources are journaled along with the key they receive, so that replaying the journal 
+        # more than once (if the program stops right after a rewrite of the file, for example) is harmless
+        if (pk is None): cPickle.dump((len(self.resources) + insertOffset, id, status, info, changeInfo, True), self.journalFile, 2)
+        else: cPickle.dump((pk, id, status, info, changeInfo, False), self.journalFile, 2)
+        
+    def _replayJournal(self):
+        for fileName in (self.journalFileName + ".old", self.journalFileName):
+            if (not os.path.exists(fileName)): continue
+            self.echo.out("[File: %s] Replaying journal '%s'..." % (self.config["filename"], fileName))
+            with open(fileName, "rb") as journalFile:
+                while True:
+                    # A truncated record at the end means the program stopped while writing it
+                    try: (pk, id, status, info, changeInfo, inserted) = cPickle.load(journalFile)
+                    except (EOFError, cPickle.UnpicklingError, ValueError): break
+                    if (inserted) and (pk == len(self.resources)): MemoryPersistenceHandler._save(self, None, id, status, info)
+                    elif (pk < len(self.resources)): MemoryPersistenceHandler._save(self, pk, None, status, info, changeInfo)
+                    else: raise ValueError("Invalid resource key %s found in journal '%s'." % (pk, fileName))
+    
+    def _copyResource(self, pk):
+        info = self.resources.getInfo(pk)
+        return {"id": self.resources.getID(pk), "status": self.resources.getStatus(pk), "info": (dict(info) if (info is not None) else None)}
+        
+    def _preserve(self, pk):
+        # Copy on write: keep the state of the resource as it was at the beginning of the dump, if it wasn't read yet
+        if (self.dumpSnapshot is not None) and (pk is not None) and (self.dumpPosition <= pk < self.dumpSize) and (pk not in self.dumpSnapshot): 
+            self.dumpSnapshot[pk] = self._copyResource(pk)
+        # Mapped files are reopened after the dump, so every change made meanwhile must be carried over (see _reopenStore)
+        if (self.dumpChanged is not None) and (pk is not None): self.dumpChanged.add(pk)
     
     def _save(self, pk, id, status, info, changeInfo = True):
-        with self.saveLock: MemoryPersistenceHandler._save(self, pk, id, status, info, changeInfo)
+        with self.saveLock: 
+            if (self.config["journal"]): self._journal(pk, id, status, info, changeInfo)
+            self._preserve(pk)
+            MemoryPersistenceHandler._save(self, pk, id, status, info, changeInfo)
+        
+    def _saveMany(self, recordsList):
+        with self.saveLock: 
+            if (self.config["journal"]): 
+                for pk, status, info, changeInfo in recordsList: self._journal(pk, None, status, info, changeInfo)
+            for pk, status, info, changeInfo in recordsList: self._preserve(pk)
+            MemoryPersistenceHandler._saveMany(self, recordsList)
+            
+    def _insertMany(self, resourcesList):
+        with self.saveLock: 
+            if (self.config["journal"]): 
+                for offset, resource in enumerate(resourcesList): self._journal(None, resource["id"], resource["status"], resource["info"], True, offset)
+            MemoryPersistenceHandler._insertMany(self, resourcesList)
+            
+    def _duplicatedIDMessage(self, resourceID):
+        return "Cannot insert resource, ID %s already exists in '%s'." % (resourceID, self.config["filename"])
     
     def _setFileHandler(self):
         for type, handler in FilePersistenceHandler.supportedFileTypes.iteritems():
@@ -495,17 +1174,79 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
             return function(self, *args)
         return decoratedFunction
                 
+    def _snapshotResources(self):
+        # Read resources in small chunks, so that the save lock is held just for a moment each time. Resources 
+        # changed since the beginning of the dump are taken from the snapshot instead (see _preserve)
+        while (self.dumpPosition < self.dumpSize):
+            with self.saveLock:
+                chunkEnd = min(self.dumpPosition + 1000, self.dumpSize)
+                chunk = [(self.dumpSnapshot.pop(pk) if (pk in self.dumpSnapshot) else self._copyResource(pk)) for pk in xrange(self.dumpPosition, chunkEnd)]
+                self.dumpPosition = chunkEnd
+            for resource in chunk: yield resource
+                
+    def _reopenStore(self, fileName):
+        # Replace the mapped store by a new one over the file just written, carrying over the changes made during the dump. 
+        # The old store is closed before the file is replaced, as mapped files can't be replaced on some platforms
+        changedList = [dict(self._copyResource(pk), pk = pk) for pk in self.dumpChanged if (pk < self.dumpSize)]
+        appendedList = [self._copyResource(pk) for pk in xrange(self.dumpSize, len(self.resources))]
+        self.resources.close()
+        common.replace(fileName, self.config["filename"])
+        store = self.fileHandler.openStore(self.config["filename"], self.fileColumns)
+        for resource in changedList:
+            pk = resource["pk"]
+            store.save(pk, resource["status"], None, False)
+            if (store.getInfo(pk) != resource["info"]): store.save(pk, None, resource["info"], True)
+        store.extend(appendedList)
+        self.resources = store
+        self.dumpChanged = None
+                
+    def _flushStore(self):
+        # Status changes are already written to mapped files, so there is no need to rewrite them
+        with self.saveLock:
+            self.resources.flush()
+            if (self.config["journal"]): 
+                self.journalFile.close()
+                self.journalFile = open(self.journalFileName, "wb")
+                if (os.path.exists(self.journalFileName + ".old")): os.remove(self.journalFileName + ".old")
+                
     def _dump(self):
-        self.echo.out("[File: %s] Saving list of resources to file..." % self.config["filename"])
-        with tempfile.NamedTemporaryFile(mode = "w", suffix = ".temp", prefix = "dump_", dir = "", delete = False) as temp: 
+        with self.dumpLock:
+            if (hasattr(self.resources, "isDirty")) and (not self.resources.isDirty()): 
+                self._flushStore()
+                return
+            self.echo.out("[File: %s] Saving list of resources to file..." % self.config["filename"])
             with self.saveLock:
-                self.fileHandler.dump(self.resources, temp, self.fileColumns)
-        common.replace(temp.name, self.config["filename"])
-        self.echo.out("[File: %s] Resources saved." % self.config["filename"])
+                self.dumpSnapshot = {}
+                self.dumpPosition = 0
+                self.dumpSize = len(self.resources)
+                if (hasattr(self.fileHandler, "openStore")): self.dumpChanged = set()
+                # Changes made from now on go to a new journal. The old one is kept until the file is replaced
+                if (self.config["journal"]): 
+                    self.journalFile.close()
+                    common.replace(self.journalFileName, self.journalFileName + ".old")
+                    self.journalFile = open(self.journalFileName, "ab")
+            try:
+                with tempfile.NamedTemporaryFile(mode = "w" + self.fileHandler.fileMode, suffix = ".temp", prefix = "dump_", dir = "", delete = False) as temp: 
+                    self.fileHandler.dump(self._snapshotResources(), temp, self.fileColumns)
+            finally:
+                with self.saveLock: self.dumpSnapshot = None
+            if (self.dumpChanged is not None): 
+                with self.saveLock: self._reopenStore(temp.name)
+            else: common.replace(temp.name, self.config["filename"])
+            if (self.config["journal"]): os.remove(self.journalFileName + ".old")
+            self.echo.out("[File: %s] Resources saved." % self.config["filename"])
+        
+    def _flushJournal(self):
+        # Rewrite the whole file only if the journal is already too big
+        with self.saveLock: 
+            self.journalFile.flush()
+            journalSize = self.journalFile.tell()
+        if (journalSize >= self.config["journalthreshold"]): self._dump()
         
     def _dumpTimerThread(self):
         try: 
-            self._dump()
+            if (self.config["journal"]): self._flushJournal()
+            else: self._dump()
         except:
             self.dumpExceptionEvent.set()
             self.echo.out("[File: %s] Exception while saving resources." % self.config["filename"], "EXCEPTION")
@@ -517,16 +1258,22 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
     @_checkDumpException
     def select(self): 
         return MemoryPersistenceHandler.select(self)
+        
+    @_checkDumpException
+    def selectMany(self, amount): 
+        return MemoryPersistenceHandler.selectMany(self, amount)
 
     @_checkDumpException
     def update(self, resourceKey, status, resourceInfo): 
         MemoryPersistenceHandler.update(self, resourceKey, status, resourceInfo)
+        
+    @_checkDumpException
+    def updateMany(self, resourcesList): 
+        MemoryPersistenceHandler.updateMany(self, resourcesList)
     
     @_checkDumpException
     def insert(self, resourcesList): 
-        for resourceID, resourceInfo in resourcesList:
-            try: MemoryPersistenceHandler.insert(self, [(resourceID, resourceInfo)])
-            except KeyError: raise KeyError("Cannot insert resource, ID %s already exists in '%s'." % (resourceID, self.config["filename"]))
+        MemoryPersistenceHandler.insert(self, resourcesList)
     
     @_checkDumpException
     def count(self): 
@@ -539,6 +1286,10 @@ class FilePersistenceHandler(MemoryPersistenceHandler):
     def shutdown(self): 
         self.timer.cancel()
         self._dump()
+        if (hasattr(self.resources, "close")): self.resources.close()
+        if (self.config["journal"]): 
+            self.journalFile.close()
+            os.remove(self.journalFileName)
         
         
 class RolloverFilePersistenceHandler(FilePersistenceHandler):
@@ -548,7 +1299,9 @@ class RolloverFilePersistenceHandler(FilePersistenceHandler):
     
     The rollover handler leaves the low level details of persistence for the file handlers attached to each file, taking care of the coordination necessary to maintain consistency between them and also of the verification of limits established. 
     
-    When inserting new resources, every time the file size limit and/or number of resources per file limit is reached rollover handler opens a new file and assigns a new instance of :class:`FilePersistenceHandler` to handle it. All resources, however, are maintained in memory. So, as in the case of :class:`FilePersistenceHandler`, this handler is not well suited for large datasets that cannot be completely fitted in memory.
+    When inserting new resources, every time the file size limit and/or number of resources per file limit is reached rollover handler opens a new file and assigns a new instance of :class:`FilePersistenceHandler` to handle it. 
+    
+    Files are loaded only when needed. At initialization, each file is just read once to count its resources in each status (and to get their IDs, if ``uniqueresourceid`` is set). A file is then loaded when :meth:`select` reaches it or when resources inside it are updated, and it is evicted from memory (being saved back to disk) as soon as it has no ``AVAILABLE`` or ``INPROGRESS`` resources anymore. This way, memory usage and number of dump threads depend only on the files currently being collected, not on the total amount of files.
     
     .. note::
     
@@ -559,7 +1312,17 @@ class RolloverFilePersistenceHandler(FilePersistenceHandler):
         self.originalConfig = deepcopy(configurationsDictionary)
         MemoryPersistenceHandler.__init__(self, configurationsDictionary)
         self._setFileHandler()
+        self.fileNamesList = []
         self.fileHandlersList = []
+        self.fileCountsList = []
+        self.fileUsersList = []
+        self.filesLock = threading.Lock()
+        self.evictedCondition = threading.Condition(self.filesLock)
+        self.evictingHandlers = set()
+        self.availableHandlers = []
+        self.availableHandlersSet = set()
+        self.totalCounts = [0] * 6
+        self.countsIndexes = {self.status.SUCCEEDED: 1, self.status.INPROGRESS: 2, self.status.AVAILABLE: 3, self.status.FAILED: 4, self.status.ERROR: 5}
         self.nextSuffixNumber = 1
         self.insertHandlerIndex = 0
         self.insertSize = -1
@@ -578,7 +1341,7 @@ class RolloverFilePersistenceHandler(FilePersistenceHandler):
         
         # Get initial file size and amount
         if (self.config["sizethreshold"]): self.insertSize = os.path.getsize(self.config["filename"])
-        if (self.config["amountthreshold"]): self.insertAmount = len(self.fileHandlersList[self.insertHandlerIndex].resources)
+        if (self.config["amountthreshold"]): self.insertAmount = self._count(self.insertHandlerIndex)[0]
                     
     def _extractConfig(self, configurationsDictionary):
         FilePersistenceHandler._extractConfig(self, configurationsDictionary)
@@ -594,73 +1357,253 @@ class RolloverFilePersistenceHandler(FilePersistenceHandler):
         if (self.config["sizethreshold"] == 0) and (self.config["amountthreshold"] == 0): 
             raise ValueError("Parameters 'sizethreshold' and 'amountthreshold' cannot be zero at the same time.")
             
-    def _addHandler(self, fileName):
+    def _loadHandler(self, fileName):
         config = deepcopy(self.originalConfig)
         config["filename"] = fileName
         config["filetype"] = self.config["filetype"]
-        handler = FilePersistenceHandler(config)
+        return FilePersistenceHandler(config)
+        
+    def _scanFile(self, fileName):
+        # Get the number of resources in each status and the IDs of the resources, without keeping the whole file in 
+        # memory. Files with pending journals are fully loaded instead, so that the journals are replayed and removed
+        if (os.path.exists(fileName + ".journal")) or (os.path.exists(fileName + ".journal.old")):
+            handler = self._loadHandler(fileName)
+            handler.shutdown()
+            return (list(handler.count()), list(handler.IDsHash))
+        counts = [0] * 6
+        IDsSet = set()
+        fileColumns = self.fileColumns.__class__(fileName, self.config["resourceidcolumn"], self.config["statuscolumn"])
+        with open(fileName, "r" + self.fileHandler.fileMode) as inputFile:
+            for resource in self.fileHandler.load(inputFile, fileColumns):
+                counts[0] += 1
+                counts[self.countsIndexes[resource["status"]]] += 1
+                if (self.config["uniqueresourceid"]): 
+                    if (resource["id"] not in IDsSet): IDsSet.add(resource["id"])
+                    else: raise KeyError("Duplicated ID found in '%s': %s." % (fileName, resource["id"])) 
+        return (counts, IDsSet)
+            
+    def _addHandler(self, fileName):
+        # The file is just scanned here. It is actually loaded only when needed (see _acquireHandler)
+        (counts, IDsList) = self._scanFile(fileName)
         if (self.config["uniqueresourceid"]): 
-            duplicated = set(handler.IDsHash).intersection(self.IDsHash)
-            if (not duplicated): self.IDsHash.update(dict.fromkeys(handler.IDsHash, len(self.fileHandlersList)))
+            duplicated = set(IDsList).intersection(self.IDsHash)
+            if (not duplicated): self.IDsHash.update(dict.fromkeys(IDsList, len(self.fileNamesList)))
             else:
-                details = ["%s ['%s']" % (resourceID, self.fileHandlersList[self.IDsHash[resourceID]].config["filename"]) for resourceID in duplicated]
+                details = ["%s ['%s']" % (resourceID, self.fileNamesList[self.IDsHash[resourceID]]) for resourceID in duplicated]
                 raise KeyError("Duplicated ID(s) found in '%s': %s" % (fileName, ", ".join(details))) 
-        self.fileHandlersList.append(handler)
+        with self.filesLock:
+            self.fileNamesList.append(fileName)
+            self.fileHandlersList.append(None)
+            self.fileCountsList.append(counts)
+            self.fileUsersList.append(0)
+            self.totalCounts = [x + y for x, y in zip(self.totalCounts, counts)]
+            if (counts[3] > 0): self._pushAvailable(len(self.fileNamesList) - 1)
+        
+    def _acquireHandler(self, handlerKey):
+        # Load the file if it is not in memory and keep it there until released. A file still being saved 
+        # after an eviction is loaded only when the save is done
+        with self.filesLock:
+            while (handlerKey in self.evictingHandlers): self.evictedCondition.wait()
+            if (self.fileHandlersList[handlerKey] is None):
+                handler = self._loadHandler(self.fileNamesList[handlerKey])
+                handler.addAvailableListener(partial(self._markAvailable, handlerKey))
+                self.fileHandlersList[handlerKey] = handler
+            self.fileUsersList[handlerKey] += 1
+            return self.fileHandlersList[handlerKey]
+            
+    def _releaseHandler(self, handlerKey):
+        with self.filesLock:
+            self.fileUsersList[handlerKey] -= 1
+            self._updateCounts(handlerKey)
+            evictedHandler = self._evictHandler(handlerKey)
+        if (evictedHandler): self._shutdownEvicted(handlerKey, evictedHandler)
+            
+    def _updateCounts(self, handlerKey):
+        # Keep the total counts up to date with the last counts of the file. Must be called while holding the files lock
+        counts = list(self.fileHandlersList[handlerKey].count())
+        self.totalCounts = [x + y - z for x, y, z in zip(self.totalCounts, counts, self.fileCountsList[handlerKey])]
+        self.fileCountsList[handlerKey] = counts
+            
+    def _evictHandler(self, handlerKey):
+        # Remove the file from memory if it is not being used and has nothing pending, returning its handler so that the 
+        # caller saves the file with _shutdownEvicted after releasing the files lock (this one must be called while holding 
+        # it). The last counts of the file are kept, so that it doesn't need to be loaded again
+        handler = self.fileHandlersList[handlerKey]
+        if (handler is None) or (self.fileUsersList[handlerKey] > 0) or (handlerKey == self.insertHandlerIndex): return None
+        counts = self.fileCountsList[handlerKey]
+        if (counts[2] == 0) and (counts[3] == 0):
+            self.fileHandlersList[handlerKey] = None
+            self.evictingHandlers.add(handlerKey)
+            return handler
+        return None
+        
+    def _shutdownEvicted(self, handlerKey, handler):
+        # Save an evicted file without holding the files lock, so that the other files can be used meanwhile
+        try: handler.shutdown()
+        finally: 
+            with self.filesLock: 
+                self.evictingHandlers.discard(handlerKey)
+                self.evictedCondition.notify_all()
+            
+    def _count(self, handlerKey):
+        return self.fileCountsList[handlerKey]
+        
+    def _hasAvailable(self, handlerKey):
+        handler = self.fileHandlersList[handlerKey]
+        if (handler is not None): return bool(handler.statusRecords[self.status.AVAILABLE])
+        return (self.fileCountsList[handlerKey][3] > 0)
+        
+    # Files that may have AVAILABLE resources are kept in a sorted list, so that select goes straight to the first one 
+    # of them, and from each file to the next one, with a binary search. Files are added to the list by their handlers' 
+    # notifications and are removed from it only by select, after checking (while holding the files lock) that they 
+    # really have nothing available anymore
+    def _pushAvailable(self, handlerKey):
+        if (handlerKey not in self.availableHandlersSet): 
+            bisect.insort(self.availableHandlers, handlerKey)
+            self.availableHandlersSet.add(handlerKey)
+            
+    def _markAvailable(self, handlerKey):
+        with self.filesLock: self._pushAvailable(handlerKey)
+        self._notifyAvailable()
+        
+    def _nextAvailable(self, handlerKey):
+        # Return the first file after handlerKey that may have resources available, discarding handlerKey if it is exhausted
+        with self.filesLock:
+            if (handlerKey is not None) and (handlerKey in self.availableHandlersSet) and (not self._hasAvailable(handlerKey)): 
+                del self.availableHandlers[bisect.bisect_left(self.availableHandlers, handlerKey)]
+                self.availableHandlersSet.remove(handlerKey)
+            if (handlerKey is None): return (self.availableHandlers[0] if (self.availableHandlers) else None)
+            index = bisect.bisect_right(self.availableHandlers, handlerKey)
+            return (self.availableHandlers[index] if (index < len(self.availableHandlers)) else None)
+        
+    def _noneAvailable(self):
+        return (not self.availableHandlersSet)
 
     def select(self): 
-        for handlerKey, handler in enumerate(self.fileHandlersList): 
-            (resourceKey, resourceID, resourceInfo) = handler.select()
+        handlerKey = self._nextAvailable(None)
+        while (handlerKey is not None): 
+            handler = self._acquireHandler(handlerKey)
+            try: (resourceKey, resourceID, resourceInfo) = handler.select()
+            finally: self._releaseHandler(handlerKey)
             if (resourceID): return ((handlerKey, resourceKey), resourceID, resourceInfo)
+            handlerKey = self._nextAvailable(handlerKey)
+        self._clearAvailable(self._noneAvailable)
         return (None, None, None)    
+        
+    def selectMany(self, amount): 
+        resourcesList = []
+        handlerKey = self._nextAvailable(None)
+        while (handlerKey is not None): 
+            handler = self._acquireHandler(handlerKey)
+            try: 
+                for (resourceKey, resourceID, resourceInfo) in handler.selectMany(amount - len(resourcesList)):
+                    resourcesList.append(((handlerKey, resourceKey), resourceID, resourceInfo))
+            finally: self._releaseHandler(handlerKey)
+            if (len(resourcesList) >= amount): break
+            handlerKey = self._nextAvailable(handlerKey)
+        else: self._clearAvailable(self._noneAvailable)
+        return resourcesList
     
     def update(self, keyPair, status, resourceInfo): 
-        self.fileHandlersList[keyPair[0]].update(keyPair[1], status, resourceInfo)
+        handler = self._acquireHandler(keyPair[0])
+        try: handler.update(keyPair[1], status, resourceInfo)
+        finally: self._releaseHandler(keyPair[0])
+        
+    def updateMany(self, resourcesList): 
+        # Group resources by file, so that each file handler updates its own resources in a single operation
+        handlersResources = {}
+        for keyPair, status, resourceInfo in resourcesList:
+            handlersResources.setdefault(keyPair[0], []).append((keyPair[1], status, resourceInfo))
+        for handlerKey, handlerResourcesList in handlersResources.iteritems(): 
+            handler = self._acquireHandler(handlerKey)
+            try: handler.updateMany(handlerResourcesList)
+            finally: self._releaseHandler(handlerKey)
     
-    def insert(self, resourcesList): 
+    def _insertExisting(self, resourcesList):
+        # Resources whose IDs already exist are sent to the files where they are, grouped by file
+        handlersResources = {}
         for resourceID, resourceInfo in resourcesList:
-            if (self.config["uniqueresourceid"]) and (resourceID in self.IDsHash):
-                handler = self.fileHandlersList[self.IDsHash[resourceID]]
-                #try: handler.insert([(resourceID, resourceInfo)])
-                #except KeyError: raise KeyError("Cannot insert resource, ID %s already exists in file '%s'." % (resourceID, handler.config["filename"]))
-                handler.insert([(resourceID, resourceInfo)])
-                continue
-        
-            with self.insertLock:
-                handler = self.fileHandlersList[self.insertHandlerIndex]
-      
+            handlersResources.setdefault(self.IDsHash[resourceID], []).append((resourceID, resourceInfo))
+        for handlerKey, handlerResourcesList in handlersResources.iteritems(): 
+            handler = self._acquireHandler(handlerKey)
+            try: handler.insert(handlerResourcesList)
+            finally: self._releaseHandler(handlerKey)
+    
+    def insert(self, resourcesList): 
+        with self.insertLock:
+            # Resources repeated in the list are inserted only after the others, when their IDs already exist
+            newResourcesList = []
+            existingResourcesList = []
+            repeatedResourcesList = []
+            newIDs = set()
+            for resourceID, resourceInfo in resourcesList:
+                if (self.config["uniqueresourceid"]): 
+                    if (resourceID in self.IDsHash): 
+                        existingResourcesList.append((resourceID, resourceInfo))
+                        continue
+                    if (resourceID in newIDs): 
+                        repeatedResourcesList.append((resourceID, resourceInfo))
+                        continue
+                    newIDs.add(resourceID)
+                newResourcesList.append((resourceID, resourceInfo))
+            if (existingResourcesList): self._insertExisting(existingResourcesList)
+            
+            position = 0
+            while (position < len(newResourcesList)):
                 # Change insert handler if size or amount thresholds were exceeded. If there is no more
                 # handlers in the list, open a new file and instantiate a new handler to take care of it
                 while ((self.insertSize >= self.config["sizethreshold"]) or 
                        (self.insertAmount >= self.config["amountthreshold"])):
-                    self.insertHandlerIndex += 1
-                    if (self.insertHandlerIndex >= len(self.fileHandlersList)): 
+                    with self.filesLock: 
+                        self.insertHandlerIndex += 1
+                        evictedHandler = self._evictHandler(self.insertHandlerIndex - 1)
+                    if (evictedHandler): self._shutdownEvicted(self.insertHandlerIndex - 1, evictedHandler)
+                    if (self.insertHandlerIndex >= len(self.fileNamesList)): 
                         newFileName = "%s.%d" % (self.config["filename"], self.nextSuffixNumber)
-                        with open(newFileName, "w") as file: self.fileHandler.dump([], file, self.fileColumns)
+                        with open(newFileName, "w" + self.fileHandler.fileMode) as file: self.fileHandler.dump([], file, self.fileColumns)
                         self._addHandler(newFileName)
                         self.nextSuffixNumber += 1
-                    handler = self.fileHandlersList[self.insertHandlerIndex]    
-                    if (self.config["sizethreshold"]): self.insertSize = os.path.getsize(handler.config["filename"])
-                    if (self.config["amountthreshold"]): self.insertAmount = len(handler.resources)
-                
-                handler.insert([(resourceID, resourceInfo)])
-                if (self.config["uniqueresourceid"]): self.IDsHash[resourceID] = self.insertHandlerIndex
+                    if (self.config["sizethreshold"]): self.insertSize = os.path.getsize(self.fileNamesList[self.insertHandlerIndex])
+                    if (self.config["amountthreshold"]): self.insertAmount = self._count(self.insertHandlerIndex)[0]
                 
+                # Take as many resources as the current file can still receive, estimating their sizes in a single pass
+                chunkEnd = len(newResourcesList)
+                if (self.config["amountthreshold"]): chunkEnd = min(chunkEnd, position + self.config["amountthreshold"] - self.insertAmount)
                 if (self.config["sizethreshold"]): 
-                    self.insertSize += len(self.fileHandler.unparse(handler.resources[-1], self.fileColumns))
-                if (self.config["amountthreshold"]): 
-                    self.insertAmount += 1
+                    resourcesIterator = itertools.islice(newResourcesList, position, chunkEnd)
+                    chunkEnd = position
+                    for resourceID, resourceInfo in resourcesIterator:
+                        if (self.insertSize >= self.config["sizethreshold"]): break
+                        self.insertSize += len(self.fileHandler.unparse({"id": resourceID, "status": self.status.AVAILABLE, "info": resourceInfo}, self.fileColumns))
+                        chunkEnd += 1
+                if (self.config["amountthreshold"]): self.insertAmount += chunkEnd - position
+                    
+                handler = self._acquireHandler(self.insertHandlerIndex)
+                try: handler.insert(newResourcesList[position:chunkEnd])
+                finally: self._releaseHandler(self.insertHandlerIndex)
+                if (self.config["uniqueresourceid"]): 
+                    self.IDsHash.update(dict.fromkeys([resourceID for resourceID, resourceInfo in newResourcesList[position:chunkEnd]], self.insertHandlerIndex))
+                position = chunkEnd
+                
+            if (repeatedResourcesList): self._insertExisting(repeatedResourcesList)
     
     def count(self):
-        counts = [0] * 6
-        for handler in self.fileHandlersList: 
-            counts = [x + y for x, y in zip(counts, handler.count())]
-        return counts
+        with self.filesLock: return list(self.totalCounts)
     
     def reset(self, status): 
-        for handler in self.fileHandlersList: handler.reset(status)
+        resetCount = 0
+        for handlerKey in xrange(len(self.fileNamesList)): 
+            if (self._count(handlerKey)[self.countsIndexes[status]] == 0): continue
+            handler = self._acquireHandler(handlerKey)
+            try: resetCount += handler.reset(status)
+            finally: self._releaseHandler(handlerKey)
+        return resetCount
         
     def shutdown(self): 
-        for handler in self.fileHandlersList: handler.shutdown()
+        with self.filesLock: 
+            while (self.evictingHandlers): self.evictedCondition.wait()
+        for handler in self.fileHandlersList: 
+            if (handler is not None): handler.shutdown()
         
         
 class MySQLPersistenceHandler(BasePersistenceHandler):
@@ -668,31 +1611,160 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
     
     The table must already exist in the database and must contain at least three columns: a primary key column, a resource ID column and a status column.
     
+    Connections to the database are taken from a pool (see :class:`ConnectionPool <MySQLPersistenceHandler.ConnectionPool>`) shared by all threads of the server, instead of being opened for each client. The pool can be configured through the ``poolsize``, ``pooltimeout``, ``poolidletimeout`` and ``poolpinginterval`` options.
+    
+    The select cache is filled by a background thread, which pages forward through the table (querying just the resources after the last one fetched) and fetches the next page as soon as the cache holds less than ``selectcachelowmark`` resources (half of ``selectcachesize``, by default). The thread starts over from the beginning of the table only when the end is reached or when resources may have been made ``AVAILABLE`` behind the last one fetched (by :meth:`insert`, :meth:`reset` or :meth:`update`).
+    
+    By default, the select cache holds just keys of ``AVAILABLE`` resources, and each resource is marked as ``INPROGRESS`` and fetched from the database only when selected. Setting the ``claim`` option makes the select cache claim whole blocks of ``selectcachesize`` resources instead, marking and fetching all of them in a single transaction (using ``SELECT ... FOR UPDATE SKIP LOCKED``, available since MySQL 8.0), so that selecting a resource doesn't need any query at all. As claims are atomic, several servers can safely share the same table in this mode. Resources remain ``INPROGRESS`` while in the cache, being made ``AVAILABLE`` again at shutdown.
+    
+    Setting the ``writebehind`` option makes :meth:`update` and :meth:`updateMany` return right away, leaving the updates in a buffer that is written to the database by a background thread every ``writebehindinterval`` milliseconds (100, by default) or as soon as it holds ``writebehindsize`` resources (1000, by default). Buffered updates of the same resource are coalesced, and the remaining ones are grouped by status and by the columns they set, each group being written with a single ``UPDATE ... CASE`` statement. Updates that make resources ``AVAILABLE`` again, as well as :meth:`count`, :meth:`reset` and :meth:`shutdown`, write the whole buffer before going on. Updates whose write fails are put back in the buffer, and connection errors are retried up to ``writebehindretries`` times (3, by default), so that :meth:`count` or :meth:`shutdown` can still write them. If the write keeps failing, the next calls to :meth:`update` and :meth:`updateMany` raise an exception.
+    
+    To avoid scanning the whole table on each call to :meth:`count`, the counts of resources are queried once at startup and then kept up to date in memory by the handler itself, assuming that updated resources were ``INPROGRESS``. The counts are reconciled with the database by a background thread every ``countinterval`` seconds (60, by default), correcting changes made by other servers or by hand. Setting ``countinterval`` to zero disables the cache, making :meth:`count` query the database every time.
+    
     .. note::
     
         This handler uses `MySQL Connector/Python <http://dev.mysql.com/doc/connector-python/en/index.html>`_ to interact with MySQL databases. 
     
     """
+    class ConnectionPool():
+        """Bounded and thread safe pool of connections to a MySQL database.
+        
+        Connections are opened only when needed, up to *size* connections at the same time. When all of them are in use, threads wait up to *timeout* seconds for one to be returned to the pool. Connections idle for more than *idleTimeout* seconds are closed, and those idle for more than *pingInterval* seconds are checked before being reused, being replaced by new ones if the check fails.
+        
+        """
+        def __init__(self, connectionArguments, size, timeout, idleTimeout, pingInterval):
+            self.connectionArguments = connectionArguments
+            self.size = size
+            self.timeout = timeout
+            self.idleTimeout = idleTimeout
+            self.pingInterval = pingInterval
+            self.idleConnections = deque()
+            self.openedAmount = 0
+            self.condition = threading.Condition()
+            
+        def _connect(self):
+            connection = mysql.connector.connect(**self.connectionArguments)
+            connection.autocommit = True
+            return connection
+            
+        def _close(self, connection):
+            try: connection.close()
+            except mysql.connector.Error: pass
+            
+        def _evictIdle(self):
+            # Idle connections are kept in order of use, the least recently used at left. Must be called while holding the condition
+            while (self.idleConnections) and (time.time() - self.idleConnections[0][1] > self.idleTimeout):
+                self._close(self.idleConnections.popleft()[0])
+                self.openedAmount -= 1
+            
+        def get(self):
+            """Take a connection from the pool, opening a new one if needed.
+            
+            Raises:
+                RuntimeError: If no connection is returned to the pool within the timeout.
+            
+            """
+            connection = None
+            with self.condition:
+                deadline = time.time() + self.timeout
+                while True:
+                    self._evictIdle()
+                    if (self.idleConnections): 
+                        (connection, lastUseTime) = self.idleConnections.pop()
+                        break
+                    if (self.openedAmount < self.size): 
+                        self.openedAmount += 1
+                        break
+                    remainingTime = deadline - time.time()
+                    if (remainingTime <= 0): raise RuntimeError("Timeout while waiting for a connection to MySQL database.")
+                    self.condition.wait(remainingTime)
+                    
+            # Health checks and new connections are done outside the lock, as they need a round trip to the server
+            if (connection is not None) and (time.time() - lastUseTime > self.pingInterval):
+                try: connection.ping()
+                except mysql.connector.Error: 
+                    self._close(connection)
+                    connection = None
+            if (connection is None):
+                try: connection = self._connect()
+                except:
+                    with self.condition: 
+                        self.openedAmount -= 1
+                        self.condition.notify()
+                    raise
+            return connection
+            
+        def put(self, connection):
+            """Return a connection to the pool."""
+            with self.condition:
+                self.idleConnections.append((connection, time.time()))
+                self.condition.notify()
+                
+        def discard(self, connection):
+            """Close a connection taken from the pool instead of returning it (after a connection error, for example)."""
+            self._close(connection)
+            with self.condition:
+                self.openedAmount -= 1
+                self.condition.notify()
+                
+        @contextmanager
+        def connection(self):
+            """Context manager that takes a connection from the pool and returns it at the end of the block.
+            
+            Connections that raised connection errors inside the block are discarded. 
+            
+            """
+            connection = self.get()
+            try: yield connection
+            except (mysql.connector.InterfaceError, mysql.connector.OperationalError):
+                self.discard(connection)
+                raise
+            except:
+                self.put(connection)
+                raise
+            else: self.put(connection)
+            
+        def close(self):
+            """Close all idle connections."""
+            with self.condition:
+                while (self.idleConnections): 
+                    self._close(self.idleConnections.popleft()[0])
+                    self.openedAmount -= 1
+    
     def __init__(self, configurationsDictionary):
         BasePersistenceHandler.__init__(self, configurationsDictionary)
         self.echo = common.EchoHandler(self.config["echo"])
-        self.local = threading.local()
+        self.pool = self.ConnectionPool(self.config["connargs"], self.config["poolsize"], self.config["pooltimeout"], self.config["poolidletimeout"], self.config["poolpinginterval"])
         self.selectCacheThreadExceptionEvent = threading.Event()
         self.selectNoResourcesEvent = threading.Event()
         self.selectWaitCondition = threading.Condition()
+        self.selectCacheRewind = False
+        self.claimLock = threading.Lock()
+        self.writeBehindThreadExceptionEvent = threading.Event()
+        self.writeBehindCondition = threading.Condition()
+        self.writeBehindLock = threading.Lock()
+        self.writeBehindBuffer = {}
+        self.writeBehindStopped = False
+        self.countsLock = threading.Lock()
+        self.countsReconcileEvent = threading.Event()
+        self.countsIndexes = {self.status.SUCCEEDED: 1, self.status.INPROGRESS: 2, self.status.AVAILABLE: 3, self.status.FAILED: 4, self.status.ERROR: 5}
+        self.countsStopped = False
+        self.countsMoves = None
         
         # Get column names
         query = "SELECT * FROM " + self.config["table"] + " LIMIT 0"
-        connection = mysql.connector.connect(**self.config["connargs"])
-        cursor = connection.cursor()
-        cursor.execute(query)
-        cursor.fetchall()
-        self.colNames = cursor.column_names
-        cursor.close()
-        connection.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query)
+            cursor.fetchall()
+            self.colNames = cursor.column_names
+            cursor.close()
         self.excludedColNames = (self.config["primarykeycolumn"], self.config["resourceidcolumn"], self.config["statuscolumn"])
         self.infoColNames = [name for name in self.colNames if (name not in self.excludedColNames)]
         
+        # Seed the counts cache before any resource is claimed by the select cache
+        if (self.config["countinterval"] > 0): self.counts = self._queryCounts()
+        
         # Start select cache thread
         self.resourcesQueue = Queue.Queue()
         t = threading.Thread(target = self._selectCacheThread)
@@ -700,6 +1772,18 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
         t.start()
         with self.selectWaitCondition: self.selectWaitCondition.wait()
         
+        # Start write-behind thread
+        if (self.config["writebehind"]): 
+            self.writeBehindThread = threading.Thread(target = self._writeBehindThread)
+            self.writeBehindThread.daemon = True
+            self.writeBehindThread.start()
+            
+        # Start counts reconciliation thread
+        if (self.config["countinterval"] > 0): 
+            self.countsThread = threading.Thread(target = self._countsThread)
+            self.countsThread.daemon = True
+            self.countsThread.start()
+        
     def _extractConfig(self, configurationsDictionary):
         BasePersistenceHandler._extractConfig(self, configurationsDictionary)
         if ("selectcachesize" not in self.config): raise KeyError("Parameter 'selectcachesize' must be specified.")
@@ -707,33 +1791,128 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
         if ("onduplicateupdate" not in self.config): self.config["onduplicateupdate"] = False
         else: self.config["onduplicateupdate"] = common.str2bool(self.config["onduplicateupdate"])
         
-    def _selectCacheQuery(self):
-        query = "SELECT " + self.config["primarykeycolumn"] + " FROM " + self.config["table"] + " WHERE " + self.config["statuscolumn"] + " = %s ORDER BY " + self.config["primarykeycolumn"]
+        if ("claim" not in self.config): self.config["claim"] = False
+        else: self.config["claim"] = common.str2bool(self.config["claim"])
+        if (self.config["claim"]) and (self.config["selectcachesize"] < 1): raise ValueError("Parameter 'selectcachesize' must be greater than zero when 'claim' is set.")
+        
+        if ("selectcachelowmark" not in self.config): self.config["selectcachelowmark"] = max(self.config["selectcachesize"] / 2, 1)
+        else: self.config["selectcachelowmark"] = int(self.config["selectcachelowmark"])
+        if (self.config["selectcachelowmark"] < 1): raise ValueError("Parameter 'selectcachelowmark' must be greater than zero.")
+        if (self.config["selectcachesize"] > 0) and (self.config["selectcachelowmark"] > self.config["selectcachesize"]): 
+            raise ValueError("Parameter 'selectcachelowmark' cannot be greater than 'selectcachesize'.")
+        
+        if ("poolsize" not in self.config): self.config["poolsize"] = 16
+        else: self.config["poolsize"] = int(self.config["poolsize"])
+        if (self.config["poolsize"] < 2): raise ValueError("Parameter 'poolsize' must be greater than one.")
+        
+        if ("pooltimeout" not in self.config): self.config["pooltimeout"] = 30
+        else: self.config["pooltimeout"] = float(self.config["pooltimeout"])
+        if (self.config["pooltimeout"] <= 0): raise ValueError("Parameter 'pooltimeout' must be greater than zero.")
+        
+        if ("poolidletimeout" not in self.config): self.config["poolidletimeout"] = 300
+        else: self.config["poolidletimeout"] = float(self.config["poolidletimeout"])
+        if (self.config["poolidletimeout"] <= 0): raise ValueError("Parameter 'poolidletimeout' must be greater than zero.")
+        
+        if ("poolpinginterval" not in self.config): self.config["poolpinginterval"] = 5
+        else: self.config["poolpinginterval"] = float(self.config["poolpinginterval"])
+        if (self.config["poolpinginterval"] < 0): raise ValueError("Parameter 'poolpinginterval' must be zero or greater.")
+        
+        if ("writebehind" not in self.config): self.config["writebehind"] = False
+        else: self.config["writebehind"] = common.str2bool(self.config["writebehind"])
+        
+        if ("writebehindinterval" not in self.config): self.config["writebehindinterval"] = 100
+        else: self.config["writebehindinterval"] = int(self.config["writebehindinterval"])
+        if (self.config["writebehindinterval"] <= 0): raise ValueError("Parameter 'writebehindinterval' must be greater than zero.")
+        
+        if ("writebehindsize" not in self.config): self.config["writebehindsize"] = 1000
+        else: self.config["writebehindsize"] = int(self.config["writebehindsize"])
+        if (self.config["writebehindsize"] <= 0): raise ValueError("Parameter 'writebehindsize' must be greater than zero.")
+        
+        if ("writebehindretries" not in self.config): self.config["writebehindretries"] = 3
+        else: self.config["writebehindretries"] = int(self.config["writebehindretries"])
+        if (self.config["writebehindretries"] < 0): raise ValueError("Parameter 'writebehindretries' must be zero or greater.")
+        
+        if ("countinterval" not in self.config): self.config["countinterval"] = 60
+        else: self.config["countinterval"] = float(self.config["countinterval"])
+        if (self.config["countinterval"] < 0): raise ValueError("Parameter 'countinterval' must be zero or greater.")
+        
+    def _selectCacheCondition(self, lastKey):
+        # Build the WHERE clause and parameters to query AVAILABLE resources after lastKey (or from the beginning, if it is None)
+        if (lastKey is None): return (" WHERE " + self.config["statuscolumn"] + " = %s", (self.status.AVAILABLE,))
+        return (" WHERE " + self.config["statuscolumn"] + " = %s AND " + self.config["primarykeycolumn"] + " > %s", (self.status.AVAILABLE, lastKey))
+    
+    def _selectCacheQuery(self, lastKey):
+        if (self.config["claim"]): return self._claimResources(lastKey)
+        (condition, parameters) = self._selectCacheCondition(lastKey)
+        query = "SELECT " + self.config["primarykeycolumn"] + " FROM " + self.config["table"] + condition + " ORDER BY " + self.config["primarykeycolumn"]
         if (self.config["selectcachesize"] > 0): query += " LIMIT %d" % self.config["selectcachesize"]
-        connection = mysql.connector.connect(**self.config["connargs"])
-        connection.autocommit = True
-        cursor = connection.cursor()
-        cursor.execute(query, (self.status.AVAILABLE,))
-        resourcesKeys = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, parameters)
+            resourcesKeys = cursor.fetchall()
+            cursor.close()
+        return [key[0] for key in resourcesKeys]
+        
+    def _claimResources(self, lastKey):
+        # Mark and fetch a whole block of resources in a single transaction. Rows locked by other servers are skipped
+        (condition, parameters) = self._selectCacheCondition(lastKey)
+        query = ("SELECT * FROM " + self.config["table"] + condition + " ORDER BY " + self.config["primarykeycolumn"] + 
+                 " LIMIT %d FOR UPDATE SKIP LOCKED" % self.config["selectcachesize"])
+        with self.pool.connection() as connection:
+            connection.start_transaction()
+            try:
+                cursor = connection.cursor(dictionary = True)
+                cursor.execute(query, parameters)
+                resources = cursor.fetchall()
+                if (resources): 
+                    keysPlaceholders = ", ".join(["%s"] * len(resources))
+                    query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " IN (" + keysPlaceholders + ")"
+                    cursor.execute(query, (self.status.INPROGRESS,) + tuple(resource[self.config["primarykeycolumn"]] for resource in resources))
+                cursor.close()
+                connection.commit()
+            except:
+                connection.rollback()
+                raise
+        self._moveCounts(self.status.AVAILABLE, self.status.INPROGRESS, len(resources))
+        return [(resource[self.config["primarykeycolumn"]], 
+                 resource[self.config["resourceidcolumn"]], 
+                 {k: resource[k] for k in self.infoColNames}) for resource in resources]
+        
+    def _selectCacheFetch(self, lastKey):
+        resourcesKeys = []
+        if (lastKey is not None): resourcesKeys = self._selectCacheQuery(lastKey)
+        if (not resourcesKeys): 
+            # Start over from the beginning of the table. Except in claim mode, resources still in the cache are 
+            # AVAILABLE in the database, so they must be selected before querying again to not be fetched twice
+            if (not self.config["claim"]): self.resourcesQueue.join()
+            resourcesKeys = self._selectCacheQuery(None)
         return resourcesKeys
         
     def _selectCacheThread(self):
         try:
             previouslyEmpty = False
+            lastKey = None
             while True:
-                if not previouslyEmpty: self.echo.out("[Table: %s] Select cache empty. Querying database..." % self.config["table"])
-                resourcesKeys = self._selectCacheQuery()
+                with self.selectWaitCondition: 
+                    if (self.selectCacheRewind): lastKey = None
+                    self.selectCacheRewind = False
+                if not previouslyEmpty: self.echo.out("[Table: %s] Select cache running low. Querying database..." % self.config["table"])
+                # Claims are put in the cache while holding the claim lock, so that they can't be missed by _releaseClaimed
+                with self.claimLock: 
+                    resourcesKeys = self._selectCacheFetch(lastKey)
+                    for key in resourcesKeys: self.resourcesQueue.put(key)
                 if resourcesKeys: 
                     if previouslyEmpty: self.echo.out("[Table: %s] New resources available now." % self.config["table"])
                     self.selectNoResourcesEvent.clear()
                     previouslyEmpty = False
                     self.echo.out("[Table: %s] Filling select cache with resources keys..." % self.config["table"])
-                    for key in resourcesKeys: self.resourcesQueue.put(key[0])
+                    lastKey = (resourcesKeys[-1][0] if (self.config["claim"]) else resourcesKeys[-1])
                     self.echo.out("[Table: %s] Select cache filled." % self.config["table"])
-                    with self.selectWaitCondition: self.selectWaitCondition.notify()
-                    self.resourcesQueue.join()
+                    self._notifyAvailable()
+                    # Wait for the cache to run low before fetching the next page
+                    with self.selectWaitCondition: 
+                        self.selectWaitCondition.notify()
+                        while (self.resourcesQueue.qsize() >= self.config["selectcachelowmark"]): self.selectWaitCondition.wait()
                 else: 
                     if not previouslyEmpty: self.echo.out("[Table: %s] No available resources found." % self.config["table"])
                     self.selectNoResourcesEvent.set()
@@ -745,12 +1924,148 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
             self.selectCacheThreadExceptionEvent.set()
             self.echo.out("[Table: %s] Exception while trying to fill select cache." % self.config["table"], "EXCEPTION")
         
-    def setup(self):
-        self.local.connection = mysql.connector.connect(**self.config["connargs"])
-        self.local.connection.autocommit = True
+    def _refreshSelectCache(self):
+        # Make the select cache thread query the database again from the beginning of the table if it has run out of resources. 
+        # Threads waiting for new resources are then notified by the select cache thread itself, as soon as the cache is filled
+        self.selectNoResourcesEvent.clear()
+        with self.selectWaitCondition: 
+            self.selectCacheRewind = True
+            self.selectWaitCondition.notify()
+            
+    def _checkSelectCacheLowMark(self):
+        if (self.resourcesQueue.qsize() < self.config["selectcachelowmark"]): 
+            with self.selectWaitCondition: self.selectWaitCondition.notify()
+            
+    def _bufferUpdates(self, resourcesList):
+        # Coalesce the updates with those already buffered for the same resources, keeping the last status and merging the information
+        if self.writeBehindThreadExceptionEvent.is_set(): 
+            raise RuntimeError("Exception in write-behind thread. Execution of MySQLPersistenceHandler aborted.")
+        with self.writeBehindCondition:
+            wasEmpty = (not self.writeBehindBuffer)
+            for resourceKey, status, resourceInfo in resourcesList:
+                info = {k: resourceInfo[k] for k in (resourceInfo or {}) if (k not in self.excludedColNames)}
+                if (resourceKey in self.writeBehindBuffer): 
+                    bufferedInfo = self.writeBehindBuffer[resourceKey][1]
+                    bufferedInfo.update(info)
+                    info = bufferedInfo
+                self.writeBehindBuffer[resourceKey] = (status, info)
+            if (wasEmpty) or (len(self.writeBehindBuffer) >= self.config["writebehindsize"]): self.writeBehindCondition.notify()
+        for resourceKey, status, resourceInfo in resourcesList: self._moveCounts(self.status.INPROGRESS, status, 1)
+        if (any(status == self.status.AVAILABLE for resourceKey, status, resourceInfo in resourcesList)): 
+            self._flushUpdates()
+            self._refreshSelectCache()
+            
+    def _flushUpdates(self):
+        # Write all buffered updates to the database. The lock keeps flushes in the same order the buffers were taken
+        with self.writeBehindLock:
+            with self.writeBehindCondition:
+                resourcesBuffer = self.writeBehindBuffer
+                self.writeBehindBuffer = {}
+            if (not resourcesBuffer): return
+            
+            groups = {}
+            for resourceKey, (status, info) in resourcesBuffer.iteritems(): 
+                groups.setdefault((status, tuple(sorted(info.keys()))), []).append(resourceKey)
+            
+            try: self._writeUpdates(resourcesBuffer, groups)
+            except:
+                # Put the updates back in the buffer, behind those made meanwhile, so that the write can be tried again
+                with self.writeBehindCondition:
+                    for resourceKey, (status, info) in resourcesBuffer.iteritems():
+                        if (resourceKey in self.writeBehindBuffer): 
+                            (newStatus, newInfo) = self.writeBehindBuffer[resourceKey]
+                            info.update(newInfo)
+                            status = newStatus
+                        self.writeBehindBuffer[resourceKey] = (status, info)
+                raise
+                
+    def _writeUpdates(self, resourcesBuffer, groups):
+        # Run one UPDATE for each group of resources with the same status and changed columns
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            for (status, columns), resourcesKeys in groups.iteritems():
+                keysPlaceholders = ", ".join(["%s"] * len(resourcesKeys))
+                casePlaceholders = " ".join(["WHEN %s THEN %s"] * len(resourcesKeys))
+                query = ("UPDATE " + self.config["table"] + " SET " + ", ".join([self.config["statuscolumn"] + " = %s"] + 
+                         ["{0} = CASE {1} {2} END".format(column, self.config["primarykeycolumn"], casePlaceholders) for column in columns]) + 
+                         " WHERE " + self.config["primarykeycolumn"] + " IN (" + keysPlaceholders + ")")
+                data = [status]
+                for column in columns:
+                    for key in resourcesKeys: data.extend((key, resourcesBuffer[key][1][column]))
+                data.extend(resourcesKeys)
+                cursor.execute(query, data)
+            cursor.close()
+        
+    def _writeBehindThread(self):
+        failures = 0
+        try:
+            while True:
+                # Wait for the first update, and then for the buffer to be filled up to the interval
+                with self.writeBehindCondition:
+                    while (not self.writeBehindBuffer) and (not self.writeBehindStopped): self.writeBehindCondition.wait()
+                    if (self.writeBehindStopped): break
+                    if (len(self.writeBehindBuffer) < self.config["writebehindsize"]): 
+                        self.writeBehindCondition.wait(self.config["writebehindinterval"] / 1000.0)
+                # Connection errors may be transient, so the write is tried again a few times before giving up
+                try: self._flushUpdates()
+                except (mysql.connector.InterfaceError, mysql.connector.OperationalError): 
+                    failures += 1
+                    if (failures > self.config["writebehindretries"]): raise
+                    self.echo.out("[Table: %s] Error while trying to write buffered updates. Trying again (%d/%d)..." % (self.config["table"], failures, self.config["writebehindretries"]), "WARNING")
+                    time.sleep(failures)
+                else: failures = 0
+        except: 
+            self.writeBehindThreadExceptionEvent.set()
+            self.echo.out("[Table: %s] Exception while trying to write buffered updates." % self.config["table"], "EXCEPTION")
+            
+    def _queryCounts(self):
+        query = "SELECT " + self.config["statuscolumn"] + ", count(*) FROM " + self.config["table"] + " GROUP BY " + self.config["statuscolumn"]
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query)
+            result = cursor.fetchall()
+            cursor.close()
+        
+        counts = [0, 0, 0, 0, 0, 0]
+        for row in result:
+            if (row[0] in self.countsIndexes): counts[self.countsIndexes[row[0]]] = row[1]
+            counts[0] += row[1]
+        return counts
+        
+    def _shiftCounts(self, counts, fromStatus, toStatus, amount):
+        # Move amount resources from one status to another in a counts list. New resources have fromStatus None
+        if (fromStatus is None): counts[0] += amount
+        elif (fromStatus in self.countsIndexes): counts[self.countsIndexes[fromStatus]] -= amount
+        if (toStatus in self.countsIndexes): counts[self.countsIndexes[toStatus]] += amount
+        
+    def _moveCounts(self, fromStatus, toStatus, amount):
+        # Move resources in the counts cache, recording the move if a reconciliation is running
+        if (self.config["countinterval"] <= 0) or (amount == 0): return
+        with self.countsLock:
+            self._shiftCounts(self.counts, fromStatus, toStatus, amount)
+            if (self.countsMoves is not None): self.countsMoves.append((fromStatus, toStatus, amount))
+            
+    def _countsThread(self):
+        # Reconcile the counts cache with the database periodically, or as soon as asked to. Moves made while 
+        # the database is queried are replayed on the fresh counts, so that they are not lost when these replace the cache
+        while True:
+            self.countsReconcileEvent.wait(self.config["countinterval"])
+            self.countsReconcileEvent.clear()
+            if (self.countsStopped): break
+            try: 
+                if (self.config["writebehind"]): self._flushUpdates()
+                with self.countsLock: self.countsMoves = []
+                counts = self._queryCounts()
+            except: self.echo.out("[Table: %s] Exception while trying to reconcile resources counts." % self.config["table"], "EXCEPTION")
+            else: 
+                with self.countsLock: 
+                    for fromStatus, toStatus, amount in self.countsMoves: self._shiftCounts(counts, fromStatus, toStatus, amount)
+                    self.counts = counts
+            finally: 
+                with self.countsLock: self.countsMoves = None
         
     def select(self):
-        # Try to get resource key from select cache
+        # Try to get resource key from select cache (or the whole resource, in claim mode)
         while True:
             try: 
                 resourceKey = self.resourcesQueue.get_nowait()
@@ -758,33 +2073,105 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
                 if self.selectCacheThreadExceptionEvent.is_set(): 
                     raise RuntimeError("Exception in select cache thread. Execution of MySQLPersistenceHandler aborted.")
                 elif self.selectNoResourcesEvent.is_set(): 
+                    self._clearAvailable(self.selectNoResourcesEvent.is_set)
                     with self.selectWaitCondition: self.selectWaitCondition.notify()
                     return (None, None, None)
             else: break
+        self._checkSelectCacheLowMark()
+            
+        if (self.config["claim"]): 
+            self.resourcesQueue.task_done()
+            return resourceKey
 
         # Fetch resource information and mark it as being processed
-        cursor = self.local.connection.cursor(dictionary = True)
-        query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
-        cursor.execute(query, (self.status.INPROGRESS, resourceKey))
-        self.resourcesQueue.task_done()
-        query = "SELECT * FROM " + self.config["table"] + " WHERE " + self.config["primarykeycolumn"] + " = %s"
-        cursor.execute(query, (resourceKey,))
-        resource = cursor.fetchone()
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary = True)
+            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
+            cursor.execute(query, (self.status.INPROGRESS, resourceKey))
+            self.resourcesQueue.task_done()
+            self._moveCounts(self.status.AVAILABLE, self.status.INPROGRESS, 1)
+            query = "SELECT * FROM " + self.config["table"] + " WHERE " + self.config["primarykeycolumn"] + " = %s"
+            cursor.execute(query, (resourceKey,))
+            resource = cursor.fetchone()
+            cursor.close()
         return (resource[self.config["primarykeycolumn"]], 
                 resource[self.config["resourceidcolumn"]], 
                 {k: resource[k] for k in self.infoColNames})
+                
+    def selectMany(self, amount):
+        # Wait for the first resource key exactly as select does, then take as many others as the select cache currently holds
+        resourcesKeys = []
+        while True:
+            try: 
+                resourcesKeys.append(self.resourcesQueue.get_nowait())
+            except Queue.Empty:
+                if self.selectCacheThreadExceptionEvent.is_set(): 
+                    raise RuntimeError("Exception in select cache thread. Execution of MySQLPersistenceHandler aborted.")
+                elif self.selectNoResourcesEvent.is_set(): 
+                    self._clearAvailable(self.selectNoResourcesEvent.is_set)
+                    with self.selectWaitCondition: self.selectWaitCondition.notify()
+                    return []
+            else: break
+        while (len(resourcesKeys) < amount):
+            try: resourcesKeys.append(self.resourcesQueue.get_nowait())
+            except Queue.Empty: break
+        self._checkSelectCacheLowMark()
+            
+        if (self.config["claim"]): 
+            for key in resourcesKeys: self.resourcesQueue.task_done()
+            return resourcesKeys
+            
+        # Fetch information of all resources and mark them as being processed
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary = True)
+            keysPlaceholders = ", ".join(["%s"] * len(resourcesKeys))
+            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " IN (" + keysPlaceholders + ")"
+            cursor.execute(query, (self.status.INPROGRESS,) + tuple(resourcesKeys))
+            for key in resourcesKeys: self.resourcesQueue.task_done()
+            self._moveCounts(self.status.AVAILABLE, self.status.INPROGRESS, len(resourcesKeys))
+            query = "SELECT * FROM " + self.config["table"] + " WHERE " + self.config["primarykeycolumn"] + " IN (" + keysPlaceholders + ")"
+            cursor.execute(query, tuple(resourcesKeys))
+            resources = {resource[self.config["primarykeycolumn"]]: resource for resource in cursor.fetchall()}
+            cursor.close()
+        return [(key, 
+                 resources[key][self.config["resourceidcolumn"]], 
+                 {k: resources[key][k] for k in self.infoColNames}) for key in resourcesKeys]
         
     def update(self, resourceKey, status, resourceInfo):
-        cursor = self.local.connection.cursor()
-        if (not resourceInfo): 
-            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
-            cursor.execute(query, (status, resourceKey))
-        else: 
-            info = {k: resourceInfo[k] for k in resourceInfo if (k not in self.excludedColNames)}
-            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s, " + " = %s, ".join(info.keys()) + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
-            cursor.execute(query, (status,) + tuple(info.values()) + (resourceKey,))
-        cursor.close()
+        if (self.config["writebehind"]): 
+            self._bufferUpdates([(resourceKey, status, resourceInfo)])
+            return
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            if (not resourceInfo): 
+                query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
+                cursor.execute(query, (status, resourceKey))
+            else: 
+                info = {k: resourceInfo[k] for k in resourceInfo if (k not in self.excludedColNames)}
+                query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s, " + " = %s, ".join(info.keys()) + " = %s WHERE " + self.config["primarykeycolumn"] + " = %s"
+                cursor.execute(query, (status,) + tuple(info.values()) + (resourceKey,))
+            cursor.close()
+        self._moveCounts(self.status.INPROGRESS, status, 1)
+        if (status == self.status.AVAILABLE): self._refreshSelectCache()
+        
+    def updateMany(self, resourcesList):
+        if (self.config["writebehind"]): 
+            self._bufferUpdates(resourcesList)
+            return
+            
+        # Resources without information to be saved are grouped by status and updated with a single query per status
+        statusKeys = {}
+        for resourceKey, status, resourceInfo in resourcesList:
+            if (not resourceInfo): statusKeys.setdefault(status, []).append(resourceKey)
+            else: self.update(resourceKey, status, resourceInfo)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            for status, resourcesKeys in statusKeys.iteritems():
+                query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " IN (" + ", ".join(["%s"] * len(resourcesKeys)) + ")"
+                cursor.execute(query, (status,) + tuple(resourcesKeys))
+                self._moveCounts(self.status.INPROGRESS, status, len(resourcesKeys))
+            cursor.close()
+        if (self.status.AVAILABLE in statusKeys): self._refreshSelectCache()
         
     def insert(self, resourcesList):
         # The method cursor.executemany() is optimized for multiple inserts, batching all data into a single INSERT INTO
@@ -798,7 +2185,7 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
         values = []
         for resourceID, resourceInfo in resourcesList: 
             newResource = {self.config["resourceidcolumn"]: resourceID}
-            newResource.update(resourceInfo)
+            if (resourceInfo): newResource.update(resourceInfo)
             resourceValues = []
             for column in self.colNames:
                 if (column in newResource): 
@@ -811,18 +2198,199 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
         if (self.config["onduplicateupdate"]):
             query += " ON DUPLICATE KEY UPDATE " + ", ".join(["{0} = VALUES({0})".format(column) for column in self.infoColNames])
         
-        cursor = self.local.connection.cursor()
-        cursor.execute(query, data)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            # Inserts that update existing resources don't change the counts, so only the resources whose IDs don't exist 
+            # yet are counted (looked up through the index of the resource ID column). Resources inserted meanwhile by 
+            # other servers may be miscounted, which is corrected by the next reconciliation
+            newResourcesIDs = set(resourceID for resourceID, resourceInfo in resourcesList)
+            if (self.config["onduplicateupdate"]) and (self.config["countinterval"] > 0): 
+                cursor.execute("SELECT " + self.config["resourceidcolumn"] + " FROM " + self.config["table"] + " WHERE " + self.config["resourceidcolumn"] + 
+                               " IN (" + ", ".join(["%s"] * len(newResourcesIDs)) + ")", tuple(newResourcesIDs))
+                newResourcesIDs.difference_update(row[0] for row in cursor.fetchall())
+            cursor.execute(query, data)
+            cursor.close()
+        self._moveCounts(None, self.status.AVAILABLE, len(newResourcesIDs))
+        self._refreshSelectCache()
+        
+    def count(self):
+        if (self.config["countinterval"] > 0): 
+            with self.countsLock: return tuple(self.counts)
+        if (self.config["writebehind"]): self._flushUpdates()
+        return tuple(self._queryCounts())
+        
+    def _releaseClaimed(self):
+        # Take out of the select cache the resources claimed but not selected yet, making them AVAILABLE again. 
+        # Must be called with the claim lock held. Return the number of resources released
+        resourcesKeys = []
+        while True:
+            try: resourcesKeys.append(self.resourcesQueue.get_nowait()[0])
+            except Queue.Empty: break
+            self.resourcesQueue.task_done()
+        if (resourcesKeys): 
+            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["primarykeycolumn"] + " IN (" + ", ".join(["%s"] * len(resourcesKeys)) + ")"
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(query, (self.status.AVAILABLE,) + tuple(resourcesKeys))
+                cursor.close()
+            self._moveCounts(self.status.INPROGRESS, self.status.AVAILABLE, len(resourcesKeys))
+        return len(resourcesKeys)
+        
+    def reset(self, status):
+        if (self.config["writebehind"]): self._flushUpdates()
+        query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["statuscolumn"] + " = %s"
+        # In claim mode, resources in the cache are INPROGRESS in the database. They are released before the reset 
+        # (and claimed again afterwards), as otherwise resetting them would make the cache claim them twice. Other 
+        # modes must not take the claim lock, as the select cache thread may hold it while waiting for the cache to empty
+        releasedAmount = 0
+        if (self.config["claim"]): self.claimLock.acquire()
+        try: 
+            if (self.config["claim"]): releasedAmount = self._releaseClaimed()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(query, (self.status.AVAILABLE, status))
+                affectedRows = cursor.rowcount
+                cursor.close()
+        finally: 
+            if (self.config["claim"]): self.claimLock.release()
+        self._moveCounts(status, self.status.AVAILABLE, affectedRows)
+        self._refreshSelectCache()
+        if (status == self.status.INPROGRESS): return affectedRows + releasedAmount
+        return affectedRows
+        
+    def shutdown(self):
+        if (self.config["countinterval"] > 0): 
+            self.countsStopped = True
+            self.countsReconcileEvent.set()
+            self.countsThread.join()
+            
+        # Stop the write-behind thread and write what is left in the buffer
+        if (self.config["writebehind"]): 
+            with self.writeBehindCondition: 
+                self.writeBehindStopped = True
+                self.writeBehindCondition.notify()
+            self.writeBehindThread.join()
+            self._flushUpdates()
+            
+        # Make available again the resources claimed but not selected yet
+        if (self.config["claim"]): 
+            with self.claimLock: self._releaseClaimed()
+        self.pool.close()
+        
+        
+class SQLitePersistenceHandler(BasePersistenceHandler):
+    """Store and retrieve resources to/from a table in a SQLite database file.
+    
+    Resources are kept on disk and read only when needed, so the amount of memory used does not depend on the number of resources. This makes this handler suitable for datasets too large to be fitted into machine's memory, without needing a database server. Memory usage is bounded by SQLite's page cache, whose size can be set through the ``cachesize`` option (in kibibytes).
+    
+    The table must already exist in the database and must contain at least three columns: a primary key column, a resource ID column and a status column. An index over the status and primary key columns is created if it does not exist yet, so that selecting, counting and reseting resources do not need to scan the whole table.
+    
+    All operations share a single connection to the database, protected by a lock. SQLite serializes writes anyway, so there is no gain in opening one connection per client.
+    
+    .. note::
+    
+        This handler uses Python's built-in :mod:`python:sqlite3` module. 
+    
+    """
+    def __init__(self, configurationsDictionary):
+        BasePersistenceHandler.__init__(self, configurationsDictionary)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.config["filename"], timeout = self.config["timeout"], check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        if (self.config["cachesize"]): self.connection.execute("PRAGMA cache_size = -%d" % self.config["cachesize"])
+        
+        # Get column names
+        cursor = self.connection.execute("SELECT * FROM " + self.config["table"] + " LIMIT 0")
+        self.colNames = [column[0] for column in cursor.description]
         cursor.close()
-        self.selectNoResourcesEvent.clear()
-        with self.selectWaitCondition: self.selectWaitCondition.notify()
+        self.excludedColNames = (self.config["primarykeycolumn"], self.config["resourceidcolumn"], self.config["statuscolumn"])
+        self.infoColNames = [name for name in self.colNames if (name not in self.excludedColNames)]
+        
+        # Create index on status
+        with self.connection:
+            self.connection.execute("CREATE INDEX IF NOT EXISTS " + self.config["table"] + "_" + self.config["statuscolumn"] + "_index ON " + 
+                                    self.config["table"] + " (" + self.config["statuscolumn"] + ", " + self.config["primarykeycolumn"] + ")")
+        
+    def _extractConfig(self, configurationsDictionary):
+        BasePersistenceHandler._extractConfig(self, configurationsDictionary)
+        if ("onduplicateupdate" not in self.config): self.config["onduplicateupdate"] = False
+        else: self.config["onduplicateupdate"] = common.str2bool(self.config["onduplicateupdate"])
+        
+        if ("timeout" not in self.config): self.config["timeout"] = 30
+        else: self.config["timeout"] = float(self.config["timeout"])
+        if (self.config["timeout"] <= 0): raise ValueError("Parameter 'timeout' must be greater than zero.")
+        
+        if ("cachesize" not in self.config): self.config["cachesize"] = 0
+        else: self.config["cachesize"] = int(self.config["cachesize"])
+        if (self.config["cachesize"] < 0): raise ValueError("Parameter 'cachesize' must be zero or greater.")
+        
+    def _noneAvailable(self):
+        query = "SELECT 1 FROM " + self.config["table"] + " WHERE " + self.config["statuscolumn"] + " = ? LIMIT 1"
+        with self.lock: return (self.connection.execute(query, (self.status.AVAILABLE,)).fetchone() is None)
+        
+    def _toResource(self, row):
+        resource = dict(zip(self.colNames, row))
+        return (resource[self.config["primarykeycolumn"]], 
+                resource[self.config["resourceidcolumn"]], 
+                {k: resource[k] for k in self.infoColNames})
+        
+    def select(self):
+        resourcesList = self.selectMany(1)
+        if (resourcesList): return resourcesList[0]
+        return (None, None, None)
+                
+    def selectMany(self, amount):
+        # Resources are fetched and marked as being processed in the same transaction
+        query = "SELECT * FROM " + self.config["table"] + " WHERE " + self.config["statuscolumn"] + " = ? ORDER BY " + self.config["primarykeycolumn"] + " LIMIT ?"
+        with self.lock, self.connection:
+            resources = [self._toResource(row) for row in self.connection.execute(query, (self.status.AVAILABLE, amount))]
+            query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = ? WHERE " + self.config["primarykeycolumn"] + " = ?"
+            self.connection.executemany(query, [(self.status.INPROGRESS, resource[0]) for resource in resources])
+        if (len(resources) < amount): self._clearAvailable(self._noneAvailable)
+        return resources
+        
+    def update(self, resourceKey, status, resourceInfo):
+        self.updateMany([(resourceKey, status, resourceInfo)])
+        
+    def updateMany(self, resourcesList):
+        with self.lock, self.connection:
+            for resourceKey, status, resourceInfo in resourcesList:
+                info = {k: resourceInfo[k] for k in (resourceInfo or {}) if (k not in self.excludedColNames)}
+                query = "UPDATE " + self.config["table"] + " SET " + " = ?, ".join([self.config["statuscolumn"]] + info.keys()) + " = ? WHERE " + self.config["primarykeycolumn"] + " = ?"
+                self.connection.execute(query, (status,) + tuple(info.values()) + (resourceKey,))
+        if (any(status == self.status.AVAILABLE for resourceKey, status, resourceInfo in resourcesList)): self._notifyAvailable()
+        
+    def insert(self, resourcesList):
+        # Resources are grouped by the columns they have values for, so that each group is inserted with a single 
+        # statement. Columns without values are left out of the statement, taking the default values of the table
+        if not resourcesList: return
+        columnsResources = {}
+        for resourceID, resourceInfo in resourcesList: 
+            info = {k: resourceInfo[k] for k in (resourceInfo or {}) if (k in self.infoColNames)}
+            columnsResources.setdefault(tuple(sorted(info.keys())), []).append((resourceID, info))
+            
+        with self.lock, self.connection:
+            for columns, columnsResourcesList in columnsResources.iteritems():
+                # Resources already in the table are updated and left out of the insert statement
+                if (self.config["onduplicateupdate"]):
+                    if (columns): query = "UPDATE " + self.config["table"] + " SET " + " = ?, ".join(columns) + " = ? WHERE " + self.config["resourceidcolumn"] + " = ?"
+                    else: query = "SELECT 1 FROM " + self.config["table"] + " WHERE " + self.config["resourceidcolumn"] + " = ?"
+                    newResourcesList = []
+                    for resourceID, info in columnsResourcesList:
+                        cursor = self.connection.execute(query, tuple(info[k] for k in columns) + (resourceID,))
+                        if (columns) and (cursor.rowcount == 0): newResourcesList.append((resourceID, info))
+                        elif (not columns) and (cursor.fetchone() is None): newResourcesList.append((resourceID, info))
+                    columnsResourcesList = newResourcesList
+                    
+                query = ("INSERT INTO " + self.config["table"] + " (" + ", ".join((self.config["resourceidcolumn"], self.config["statuscolumn"]) + columns) + ") " +
+                         "VALUES (" + ", ".join(["?"] * (len(columns) + 2)) + ")")
+                self.connection.executemany(query, [(resourceID, self.status.AVAILABLE) + tuple(info[k] for k in columns) for resourceID, info in columnsResourcesList])
+        self._notifyAvailable()
         
     def count(self):
         query = "SELECT " + self.config["statuscolumn"] + ", count(*) FROM " + self.config["table"] + " GROUP BY " + self.config["statuscolumn"]
-        cursor = self.local.connection.cursor()
-        cursor.execute(query)
-        result = cursor.fetchall()
-        cursor.close()
+        with self.lock: result = self.connection.execute(query).fetchall()
         
         counts = [0, 0, 0, 0, 0, 0]
         for row in result:
@@ -836,13 +2404,10 @@ class MySQLPersistenceHandler(BasePersistenceHandler):
         return tuple(counts)
         
     def reset(self, status):
-        query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = %s WHERE " + self.config["statuscolumn"] + " = %s"
-        cursor = self.local.connection.cursor()
-        cursor.execute(query, (self.status.AVAILABLE, status))
-        affectedRows = cursor.rowcount
-        cursor.close()
-        with self.selectWaitCondition: self.selectWaitCondition.notify()
+        query = "UPDATE " + self.config["table"] + " SET " + self.config["statuscolumn"] + " = ? WHERE " + self.config["statuscolumn"] + " = ?"
+        with self.lock, self.connection: affectedRows = self.connection.execute(query, (self.status.AVAILABLE, status)).rowcount
+        if (affectedRows): self._notifyAvailable()
         return affectedRows
         
-    def finish(self):
-        self.local.connection.close()
+    def shutdown(self):
+        with self.lock: self.connection.close()
@@ -31,6 +31,7 @@ if (args.loggingPath is not None): config["global"]["echo"]["mandatory"]["loggin
 if (args.loggingFileMode is not None): config["global"]["echo"]["mandatory"]["loggingfilemode"] = args.loggingFileMode
 
 # Run server
-server = serverlib.ThreadedTCPServer(config)
+if (config["server"]["engine"] == "async"): server = serverlib.AsyncTCPServer(config)
+else: server = serverlib.ThreadedTCPServer(config)
 server.run()
                 
\ No newline at end of file
@@ -4,25 +4,31 @@ import sys
 import os
 import socket
 import SocketServer
+import asyncore
+import asynchat
 import threading
+import Queue
+import heapq
 import json
-import time
 import timeit
 import common
 import persistence
 import filters
 from datetime import datetime
 from copy import deepcopy
+from collections import deque
+from functools import partial
 
 
 # ==================== Global variables ====================
 # Dictionary to store information lists about each client:
-#   [network address, process identification (PID), primary key of the resource being collected, 
-#    ID of the resource being collected, number of resources already collected, 
+#   [network address, process identification (PID), list of primary keys of the resources being collected, 
+#    list of IDs of the resources being collected, number of resources already collected, 
 #    collection start time and last GET_ID request time] 
 clientsInfo = {} 
 
-# Store a reference for the thread running the client and an event to interrupt its execution
+# Store a reference for the thread running the client (or for the connection object, when the asynchronous 
+# engine is used) and an event to interrupt its execution
 clientsThreads = {}
 
 # Define the next ID to give to a new client
@@ -48,6 +54,11 @@ cleanUpEvent = threading.Event()
 # ==================== Classes ====================
 class ServerHandler(SocketServer.BaseRequestHandler):
     def setup(self):
+        self.thread = threading.current_thread()
+        self.client = common.NetworkHandler(self.request)
+        self.connect(self.client.recv())
+        
+    def connect(self, message):
         # Declare global variables
         global nextFreeID
         global connections
@@ -55,11 +66,11 @@ class ServerHandler(SocketServer.BaseRequestHandler):
         # Define some class variables
         self.clientID = 0
         self.cleanUpThread = False
+        self.postponed = False
+        self.finishedWait = None
+        self.finishing = False
     
         # Try to accept the new client connection
-        self.client = common.NetworkHandler(self.request)
-        message = self.client.recv()
-    
         with shutdownLock:
             with finishedCondition: 
                 if (self.server.state != "running") and ((message["type"] == "client") or cleanUpEvent.is_set()): 
@@ -77,14 +88,33 @@ class ServerHandler(SocketServer.BaseRequestHandler):
                 clientPid = message["processid"]
                 self.clientID = nextFreeID
                 nextFreeID += 1
-                clientsThreads[self.clientID ] = (threading.current_thread(), threading.Event())
-                clientsInfo[self.clientID ] = [clientAddress, clientPid, None, None, -1, datetime.now(), None]
+                clientsThreads[self.clientID ] = (self.thread, threading.Event())
+                clientsInfo[self.clientID ] = [clientAddress, clientPid, [], [], 0, datetime.now(), None]
                 self.server.echo.out("New client connected: %d" % self.clientID)
+                
+            # Set timing variables initial values
+            serverAggregatedTimes[self.clientID] = 0.0
+            clientAggregatedTimes[self.clientID] = 0.0
+            crawlerAggregatedTimes[self.clientID] = 0.0
+            numTimingMeasures[self.clientID] = long(0)
+            numCrawlingMeasures[self.clientID] = long(0)
 
             self.connectionAccepted = True
             self.client.send({"command": "ACCEPTED", "clientid": self.clientID})
 
     def handle(self):
+        running = self.connectionAccepted
+        while (running):
+            startClientTime = timeit.default_timer()
+            try: message = self.client.recv()
+            except socket.error: message = None
+            endClientTime = timeit.default_timer()
+            running = self.processMessage(message, endClientTime - startClientTime)
+            
+    def processMessage(self, message, clientTime):
+        # Process a single message sent by the client, returning whether the connection must be kept open. The 
+        # time the client took to send the message is given by clientTime, which is also used as crawling time
+    
         # Declare global variables
         global serverAggregatedTimes
         global clientAggregatedTimes
@@ -100,214 +130,278 @@ class ServerHandler(SocketServer.BaseRequestHandler):
         client = self.client
         clientID = self.clientID
         
-        # Set timing variables initial values
-        serverAggregatedTimes[clientID] = 0.0
-        clientAggregatedTimes[clientID] = 0.0
-        crawlerAggregatedTimes[clientID] = 0.0
-        numTimingMeasures[clientID] = long(0)
-        numCrawlingMeasures[clientID] = long(0)
-    
         # Start to handle
         running = True
-        while (self.connectionAccepted and running):
-            try: 
-                startClientTime = timeit.default_timer()
-                startCrawlerTime = timeit.default_timer()
-                
-                message = client.recv()
-                
-                endClientTime = timeit.default_timer()
-                endCrawlerTime = timeit.default_timer()
-                startServerTime = timeit.default_timer()
-                
-                # Stop thread execution if the connection has been interrupted
-                if (not message): 
-                    echo.out("Connection to client %d has been abruptly closed." % clientID, "ERROR")
-                    clientResourceKey = clientsInfo[clientID][2]
-                    if (clientResourceKey is not None): persist.update(clientResourceKey, status.ERROR, None)
-                    running = False
-                    continue
+        try: 
+            startServerTime = timeit.default_timer()
+            
+            # Stop handling the client if the connection has been interrupted
+            if (not message): 
+                echo.out("Connection to client %d has been abruptly closed." % clientID, "ERROR")
+                clientResourcesKeys = clientsInfo[clientID][2]
+                if (clientResourcesKeys): persist.updateMany([(key, status.ERROR, None) for key in clientResourcesKeys])
+                return False
 
-                command = message["command"]
-                
-                if (command == "GET_ID"):
-                    clientStopEvent = clientsThreads[clientID][1]
-                    clientsInfo[clientID][2] = None
-                    clientsInfo[clientID][3] = None
-                    clientsInfo[clientID][4] += 1
-                    clientsInfo[clientID][6] = datetime.now()
-                    while True:
-                        # If the client hasn't been removed, check resource availability
-                        if (not clientStopEvent.is_set()):
+            command = message["command"]
+            
+            if (command == "GET_ID") or (command == "GET_IDS"):
+                clientStopEvent = clientsThreads[clientID][1]
+                clientsInfo[clientID][6] = datetime.now()
+                while True:
+                    # If the client hasn't been removed, check resource availability
+                    if (not clientStopEvent.is_set()):
+                        if (command == "GET_IDS"): 
+                            resourcesList = persist.selectMany(message["amount"])
+                        else: 
                             (resourceKey, resourceID, resourceInfo) = persist.select()
-                            # If there is a resource available, send ID to client
-                            if (resourceID):
-                                clientsInfo[clientID][2] = resourceKey
-                                clientsInfo[clientID][3] = resourceID
-                                clientsInfo[clientID][6] = datetime.now()
-                                filters = self.applyFilters(resourceID, resourceInfo)
-                                client.send({"command": "GIVE_ID", "resourceid": resourceID, "filters": filters})
-                                break
-                            else:
-                                # If there aren't resources available and loopforever is true, wait some time and check again
-                                if (config["server"]["loopforever"]): 
-                                    time.sleep(5)
-                                # If there aren't resources available and loopforever is false, finish all clients
-                                else:
-                                    with shutdownLock: 
-                                        if (self.server.state == "running"): 
-                                            echo.out("Task done. Finishing clients...")
-                                            self.server.state = "finishing"
-                                            for ID in clientsInfo.keys(): self.removeClient(ID)
-                                            self.cleanUpThread = True
-                        # If the client has been removed, finish it
+                            resourcesList = [(resourceKey, resourceID, resourceInfo)] if (resourceID) else []
+                        # If there are resources available, send IDs to client
+                        if (resourcesList):
+                            resourcesData = []
+                            for (resourceKey, resourceID, resourceInfo) in resourcesList:
+                                clientsInfo[clientID][2].append(resourceKey)
+                                clientsInfo[clientID][3].append(resourceID)
+                                resourcesData.append({"resourceid": resourceID, "filters": self.applyFilters(resourceID, resourceInfo)})
+                            clientsInfo[clientID][6] = datetime.now()
+                            if (command == "GET_IDS"): client.send({"command": "GIVE_IDS", "resources": resourcesData})
+                            else: client.send({"command": "GIVE_ID", "resourceid": resourcesData[0]["resourceid"], "filters": resourcesData[0]["filters"]})
+                            break
+                        # If there aren't resources available but the client is still working on other resources, 
+                        # tell it to go on with them. It will ask again when there's nothing else left to do
+                        elif (clientsInfo[clientID][2]):
+                            client.send({"command": "NO_ID", "release": False})
+                            break
                         else:
-                            del clientsInfo[clientID]
-                            if (self.server.state == "running"):
-                                client.send({"command": "FINISH", "reason": "removed"})
-                                echo.out("Client %d removed." % clientID)
+                            # If there aren't resources available and loopforever is true, wait some time and check again
+                            if (config["server"]["loopforever"]): 
+                                if (not self.waitResources()): 
+                                    self.postponed = True
+                                    break
+                            # If there aren't resources available and loopforever is false, finish all clients
                             else:
-                                if (self.server.state == "finishing"): 
-                                    client.send({"command": "FINISH", "reason": "task done"})
-                                elif (self.server.state == "shutting down"): 
-                                    client.send({"command": "FINISH", "reason": "shut down"})
-                                echo.out("Client %d finished." % clientID)
-                            running = False
-                            break
-                    
-                elif (command == "DONE_ID"):
-                    clientResourceKey = clientsInfo[clientID][2]
-                    clientResourceID = clientsInfo[clientID][3]
-                    clientResourceInfo = message["resourceinfo"]
-                    clientExtraInfo = message["extrainfo"]
-                    clientNewResources = message["newresources"]
-                    self.callbackFilters(clientResourceID, clientResourceInfo, clientExtraInfo, clientNewResources)
-                    if (config["global"]["feedback"]): persist.insert(clientNewResources)
-                    persist.update(clientResourceKey, status.SUCCEEDED, clientResourceInfo)
-                    client.send({"command": "DONE_RET"})
-                            
-                elif (command == "EXCEPTION"):
-                    clientResourceKey = clientsInfo[clientID][2]
-                    clientResourceID = clientsInfo[clientID][3]
-                    if (message["type"] == "fail"):
-                        echo.out("Client %s reported fail for resource %s." % (clientID, clientResourceID), "WARNING")
-                        persist.update(clientResourceKey, status.FAILED, None)
-                        client.send({"command": "EXCEPTION_RET"})
-                    elif (message["type"] == "error"):
-                        echo.out("Client %s reported error for resource %s. Connection closed." % (clientID, clientResourceID), "ERROR")
-                        persist.update(clientResourceKey, status.ERROR, None)
+                                with shutdownLock: 
+                                    if (self.server.state == "running"): 
+                                        echo.out("Task done. Finishing clients...")
+                                        self.server.state = "finishing"
+                                        for ID in clientsInfo.keys(): self.removeClient(ID)
+                                        self.cleanUpThread = True
+                    # If the client has been removed while still holding resources, ask it to give back those it hasn't started 
+                    # to crawl yet. The ones already in progress are finished, unless the whole task is done, when the client 
+                    # must crawl all its resources before leaving, as nobody else would collect them
+                    elif (clientsInfo[clientID][2]):
+                        client.send({"command": "NO_ID", "release": (self.server.state != "finishing")})
+                        break
+                    # If the client has been removed, finish it
+                    else:
+                        del clientsInfo[clientID]
+                        if (self.server.state == "running"):
+                            client.send({"command": "FINISH", "reason": "removed"})
+                            echo.out("Client %d removed." % clientID)
+                        else:
+                            if (self.server.state == "finishing"): 
+                                client.send({"command": "FINISH", "reason": "task done"})
+                            elif (self.server.state == "shutting down"): 
+                                client.send({"command": "FINISH", "reason": "shut down"})
+                            echo.out("Client %d finished." % clientID)
                         running = False
-                                    
-                elif (command == "GET_STATUS"):
-                    # Clients status
-                    clientsStatusList = []
-                    for (ID, info) in clientsInfo.items():
-                        clientThreadState = ((-1 if clientsThreads[ID][1].is_set() else 0) if clientsThreads[ID][0].is_alive() else -2)
-                        clientStatus =  {"clientid": ID}
-                        clientStatus["threadstate"] = clientThreadState
-                        clientStatus["address"] = info[0]
-                        clientStatus["pid"] = info[1]
-                        clientStatus["resourceid"] = info[3]
-                        clientStatus["amount"] = info[4]
-                        clientStatus["time"] = {"start": info[5]}
-                        clientStatus["time"]["lastrequest"] = info[6]
-                        clientStatus["time"]["agrserver"] = serverAggregatedTimes[ID]
-                        clientStatus["time"]["agrclient"] = clientAggregatedTimes[ID]
-                        clientStatus["time"]["agrcrawler"] = crawlerAggregatedTimes[ID]
-                        clientStatus["time"]["timingmeasures"] = numTimingMeasures[ID]
-                        clientStatus["time"]["crawlingmeasures"] = numCrawlingMeasures[ID]
-                        clientsStatusList.append(clientStatus)
-                    # Server status
-                    serverStatus = {"pid": os.getpid()}
-                    serverStatus["state"] = self.server.state
-                    counts = persist.count()
-                    serverStatus["counts"] = {"total": counts[0]}
-                    serverStatus["counts"]["succeeded"] = counts[1]
-                    serverStatus["counts"]["inprogress"] = counts[2]
-                    serverStatus["counts"]["available"] = counts[3]
-                    serverStatus["counts"]["failed"] = counts[4]
-                    serverStatus["counts"]["error"] = counts[5]
-                    serverStatus["time"] = {"start": self.server.startTime}
-                    serverStatus["time"]["current"] = datetime.now()
-                    # Send status 
-                    client.send({"command": "GIVE_STATUS", "clients": clientsStatusList, "server": serverStatus})
+                        break
+                
+            elif (command == "DONE_ID"):
+                (clientResourceKey, clientResourceID) = self.popResource(message.get("resourceid"))
+                clientResourceInfo = message["resourceinfo"]
+                clientExtraInfo = message["extrainfo"]
+                clientNewResources = message["newresources"]
+                callbacksPending = self.callbackFilters(clientResourceID, clientResourceInfo, clientExtraInfo, clientNewResources, partial(self.callbacksDone, clientResourceKey, clientResourceInfo))
+                if (config["global"]["feedback"]): persist.insert(clientNewResources)
+                if (not callbacksPending): persist.update(clientResourceKey, status.SUCCEEDED, clientResourceInfo)
+                clientsInfo[clientID][4] += 1
+                client.send({"command": "DONE_RET"})
+                        
+            elif (command == "EXCEPTION"):
+                (clientResourceKey, clientResourceID) = self.popResource(message.get("resourceid"))
+                clientsInfo[clientID][4] += 1
+                if (message["type"] == "fail"):
+                    echo.out("Client %s reported fail for resource %s." % (clientID, clientResourceID), "WARNING")
+                    persist.update(clientResourceKey, status.FAILED, None)
+                    client.send({"command": "EXCEPTION_RET"})
+                elif (message["type"] == "error"):
+                    echo.out("Client %s reported error for resource %s. Connection closed." % (clientID, clientResourceID), "ERROR")
+                    persist.update(clientResourceKey, status.ERROR, None)
+                    # Other resources still held by the client are made available again, except those it reports as 
+                    # being crawled when the error happened, which are treated as if the connection was abruptly closed
+                    inProgressIDs = message.get("inprogress", [])
+                    clientResourcesList = zip(clientsInfo[clientID][2], clientsInfo[clientID][3])
+                    if (clientResourcesList): persist.updateMany([(key, (status.ERROR if (ID in inProgressIDs) else status.AVAILABLE), None) for (key, ID) in clientResourcesList])
                     running = False
                     
-                elif (command == "RM_CLIENTS"):
-                    clientIDs = set(message["clientids"])
-                    clientNames = message["clientnames"]
-                    # Get IDs of clients specified by name or IDs corresponding to the keywords 'all' and 'disconnected'
-                    for (ID, info) in clientsInfo.items():
-                        if (("all" in clientNames) or
-                            (info[0][0] in clientNames) or 
-                            ((not clientsThreads[ID][0].is_alive()) and ("disconnected" in clientNames))): 
-                            clientIDs.add(ID)
-                    # Do remove
-                    removeSuccess = []
-                    removeError = []
-                    for ID in clientIDs:
-                        if (self.removeClient(ID)): removeSuccess.append(ID)
-                        else: removeError.append(ID)
-                    # Wait for alive threads to safely terminate
-                    if (removeSuccess): 
-                        with finishedCondition: 
-                            while any(ID in clientsInfo for ID in removeSuccess): finishedCondition.wait()
-                    # Send response to manager
-                    client.send({"command": "RM_RET", "successlist": [str(ID) for ID in removeSuccess], "errorlist": [str(ID) for ID in removeError]})
-                    running = False
+            elif (command == "RELEASE_IDS"):
+                releasedResources = [self.popResource(resourceID) for resourceID in message["resourceids"]]
+                persist.updateMany([(resourceKey, status.AVAILABLE, None) for (resourceKey, resourceID) in releasedResources])
+                client.send({"command": "RELEASE_RET"})
                     
-                elif (command == "RESET"):
-                    statusName = message["status"]
-                    if ((statusName == "INPROGRESS") or (statusName == "SUCCEEDED")) and (clientsInfo): 
-                        client.send({"command": "RESET_RET", "fail": True, "reason": "It is not possible to reset %s resources while there are clients connected." % statusName})
-                    else:
-                        resetCount = persist.reset(getattr(status, statusName))
-                        client.send({"command": "RESET_RET", "fail": False, "count": resetCount})
-                    running = False
-                        
-                elif (command == "SHUTDOWN"):
-                    with shutdownLock:
-                        if (self.server.state == "running"):
-                            echo.out("Finishing all clients to shut down...")
-                            self.server.state = "shutting down"
-                            for ID in clientsInfo.keys(): self.removeClient(ID)
-                            self.cleanUpThread = True
-                        else: 
-                            client.send({"command": "SD_RET", "fail": True, "reason": "Cannot execute command, server is %s." % ("already shutting down" if (self.server.state == "shutting down") else self.server.state)})
+            elif (command == "DONE_IDS"):
+                updatesList = []
+                newResourcesList = []
+                errorReported = False
+                for result in message["done"]:
+                    (clientResourceKey, clientResourceID) = self.popResource(result["resourceid"])
+                    callbacksPending = self.callbackFilters(clientResourceID, result["resourceinfo"], result["extrainfo"], result["newresources"], partial(self.callbacksDone, clientResourceKey, result["resourceinfo"]))
+                    if (config["global"]["feedback"]) and (result["newresources"]): newResourcesList.extend(result["newresources"])
+                    if (not callbacksPending): updatesList.append((clientResourceKey, status.SUCCEEDED, result["resourceinfo"]))
+                for exception in message["exceptions"]:
+                    (clientResourceKey, clientResourceID) = self.popResource(exception["resourceid"])
+                    if (exception["type"] == "fail"):
+                        echo.out("Client %s reported fail for resource %s." % (clientID, clientResourceID), "WARNING")
+                        updatesList.append((clientResourceKey, status.FAILED, None))
+                    elif (exception["type"] == "error"):
+                        echo.out("Client %s reported error for resource %s. Connection closed." % (clientID, clientResourceID), "ERROR")
+                        updatesList.append((clientResourceKey, status.ERROR, None))
+                        errorReported = True
+                if (newResourcesList): persist.insert(newResourcesList)
+                persist.updateMany(updatesList)
+                clientsInfo[clientID][4] += len(message["done"]) + len(message["exceptions"])
+                if (errorReported):
+                    # The client stops crawling the batch as soon as an error happens, so the resources not 
+                    # reported were never crawled and can be made available to other clients again
+                    persist.updateMany([(key, status.AVAILABLE, None) for key in clientsInfo[clientID][2]])
+                    del clientsInfo[clientID][2][:]
+                    del clientsInfo[clientID][3][:]
                     running = False
+                else: client.send({"command": "DONE_IDS_RET"})
+                                
+            elif (command == "GET_STATUS"):
+                # Clients status
+                clientsStatusList = []
+                for (ID, info) in clientsInfo.items():
+                    clientThreadState = ((-1 if clientsThreads[ID][1].is_set() else 0) if clientsThreads[ID][0].is_alive() else -2)
+                    clientStatus =  {"clientid": ID}
+                    clientStatus["threadstate"] = clientThreadState
+                    clientStatus["address"] = info[0]
+                    clientStatus["pid"] = info[1]
+                    clientStatus["resourceids"] = info[3]
+                    clientStatus["amount"] = info[4]
+                    clientStatus["time"] = {"start": info[5]}
+                    clientStatus["time"]["lastrequest"] = info[6]
+                    clientStatus["time"]["agrserver"] = serverAggregatedTimes[ID]
+                    clientStatus["time"]["agrclient"] = clientAggregatedTimes[ID]
+                    clientStatus["time"]["agrcrawler"] = crawlerAggregatedTimes[ID]
+                    clientStatus["time"]["timingmeasures"] = numTimingMeasures[ID]
+                    clientStatus["time"]["crawlingmeasures"] = numCrawlingMeasures[ID]
+                    clientsStatusList.append(clientStatus)
+                # Server status
+                serverStatus = {"pid": os.getpid()}
+                serverStatus["state"] = self.server.state
+                counts = persist.count()
+                serverStatus["counts"] = {"total": counts[0]}
+                serverStatus["counts"]["succeeded"] = counts[1]
+                serverStatus["counts"]["inprogress"] = counts[2]
+                serverStatus["counts"]["available"] = counts[3]
+                serverStatus["counts"]["failed"] = counts[4]
+                serverStatus["counts"]["error"] = counts[5]
+                serverStatus["filters"] = self.server.filtersPool.status()
+                serverStatus["time"] = {"start": self.server.startTime}
+                serverStatus["time"]["current"] = datetime.now()
+                # Send status 
+                client.send({"command": "GIVE_STATUS", "clients": clientsStatusList, "server": serverStatus})
+                running = False
+                
+            elif (command == "RM_CLIENTS"):
+                clientIDs = set(message["clientids"])
+                clientNames = message["clientnames"]
+                # Get IDs of clients specified by name or IDs corresponding to the keywords 'all' and 'disconnected'
+                for (ID, info) in clientsInfo.items():
+                    if (("all" in clientNames) or
+                        (info[0][0] in clientNames) or 
+                        ((not clientsThreads[ID][0].is_alive()) and ("disconnected" in clientNames))): 
+                        clientIDs.add(ID)
+                # Do remove
+                removeSuccess = []
+                removeError = []
+                for ID in clientIDs:
+                    if (self.removeClient(ID)): removeSuccess.append(ID)
+                    else: removeError.append(ID)
+                # Wait for alive threads to safely terminate and send response to manager
+                response = {"command": "RM_RET", "successlist": [str(ID) for ID in removeSuccess], "errorlist": [str(ID) for ID in removeError]}
+                self.waitFinished(lambda: not any(ID in clientsInfo for ID in removeSuccess), partial(client.send, response))
+                running = False
                 
-                endServerTime = timeit.default_timer()
-                if (command == "GET_ID" or command == "DONE_ID" or command == "EXCEPTION"):
-                    serverAggregatedTimes[clientID] += (endServerTime - startServerTime)
-                    clientAggregatedTimes[clientID] += (endClientTime - startClientTime)
-                    numTimingMeasures[clientID] += 1
-                if (command == "DONE_ID" or command == "EXCEPTION"):
-                    crawlerAggregatedTimes[clientID] += (endCrawlerTime - startCrawlerTime)
-                    numCrawlingMeasures[clientID] += 1
+            elif (command == "RESET"):
+                statusName = message["status"]
+                if ((statusName == "INPROGRESS") or (statusName == "SUCCEEDED")) and (clientsInfo): 
+                    client.send({"command": "RESET_RET", "fail": True, "reason": "It is not possible to reset %s resources while there are clients connected." % statusName})
+                else:
+                    resetCount = persist.reset(getattr(status, statusName))
+                    client.send({"command": "RESET_RET", "fail": False, "count": resetCount})
+                running = False
                     
-            except:
-                echo.out("Exception while processing a request from client %d. Execution of thread '%s' aborted." % (clientID, threading.current_thread().name), "EXCEPTION")
+            elif (command == "SHUTDOWN"):
+                with shutdownLock:
+                    if (self.server.state == "running"):
+                        echo.out("Finishing all clients to shut down...")
+                        self.server.state = "shutting down"
+                        for ID in clientsInfo.keys(): self.removeClient(ID)
+                        self.cleanUpThread = True
+                    else: 
+                        client.send({"command": "SD_RET", "fail": True, "reason": "Cannot execute command, server is %s." % ("already shutting down" if (self.server.state == "shutting down") else self.server.state)})
                 running = False
+            
+            endServerTime = timeit.default_timer()
+            if (command in ("GET_ID", "GET_IDS", "DONE_ID", "DONE_IDS", "EXCEPTION")):
+                serverAggregatedTimes[clientID] += (endServerTime - startServerTime)
+                clientAggregatedTimes[clientID] += clientTime
+                numTimingMeasures[clientID] += 1
+            if (command in ("DONE_ID", "DONE_IDS", "EXCEPTION")):
+                crawlerAggregatedTimes[clientID] += clientTime
+                numCrawlingMeasures[clientID] += 1
+                
+        except:
+            echo.out("Exception while processing a request from client %d. Execution of thread '%s' aborted." % (clientID, threading.current_thread().name), "EXCEPTION")
+            running = False
+            
+        return running
+        
+    def waitResources(self):
+        # Wait for new resources when there isn't any available and loopforever is true. The persistence handler wakes 
+        # up the thread as soon as new resources arrive, but availability is checked again after some time anyway, as 
+        # the client may have been removed meanwhile. Return False if the handler cannot wait and the request must be 
+        # tried again later instead
+        self.server.persist.waitAvailable(5)
+        return True
+    
+    def waitFinished(self, ready, function):
+        # Call function as soon as ready returns True. The condition is checked with finishedCondition held, 
+        # again every time a connection finishes
+        with finishedCondition:
+            while (not ready()): finishedCondition.wait()
+        function()
     
     def finish(self):
         if (self.connectionAccepted):
-            global connections
-        
+            self.finishing = True
             for filter in self.server.parallelFilters: filter.finish()
             for filter in self.server.sequentialFilters: filter.finish()
             self.server.persist.finish()
             
-            if (self.cleanUpThread):
-                with finishedCondition:
-                    while (connections > 1): finishedCondition.wait()
-                    cleanUpEvent.set()
-                self.server.shutdown()
-                if (self.clientID == 0): self.client.send({"command": "SD_RET", "fail": False})
-                
-            with finishedCondition: 
-                connections -= 1
-                self.client.close()
-                finishedCondition.notify_all()
+            if (self.cleanUpThread): self.waitFinished(self.lastConnection, self.cleanUp)
+            else: self.closeConnection()
+            
+    def lastConnection(self):
+        # Once this is the last connection left, new ones are refused (checked with finishedCondition held)
+        if (connections > 1): return False
+        cleanUpEvent.set()
+        return True
+        
+    def cleanUp(self):
+        self.server.shutdown()
+        if (self.clientID == 0): self.client.send({"command": "SD_RET", "fail": False})
+        self.closeConnection()
+        
+    def closeConnection(self):
+        global connections
+        with finishedCondition: 
+            connections -= 1
+            self.client.close()
+            finishedCondition.notify_all()
         
     def removeClient(self, ID):
         with removeClientLock:
@@ -321,63 +415,438 @@ class ServerHandler(SocketServer.BaseRequestHandler):
                     self.server.echo.out("Client %d removed." % ID)
                 return True
             return False
+            
+    def popResource(self, resourceID = None):
+        # Remove a resource from the list of resources being collected by the client, returning its key and ID. 
+        # If no ID is given, the oldest resource handed out to the client is taken
+        clientResourcesKeys = clientsInfo[self.clientID][2]
+        clientResourcesIDs = clientsInfo[self.clientID][3]
+        index = clientResourcesIDs.index(resourceID) if (resourceID is not None) else 0
+        return (clientResourcesKeys.pop(index), clientResourcesIDs.pop(index))
                 
-    def threadedFilterApplyWrapper(self, filter, resourceID, resourceInfo, outputList):
-        data = filter.apply(resourceID, deepcopy(resourceInfo), None)
-        outputList.append({"name": filter.name, "data": data})
+    def filterInput(self, filter, value):
+        # Filters that don't change their input receive read-only views of it instead of copies
+        if (filter.config["readonly"]): return common.freeze(value)
+        return deepcopy(value)
+        
+    def threadedFilterApplyWrapper(self, filter, resourceID, resourceInfo):
+        data = filter.applyCached(resourceID, self.filterInput(filter, resourceInfo), None)
+        return {"name": filter.name, "data": data}
         
-    def threadedFilterCallbackWrapper(self, filter, resourceID, resourceInfo, newResources, extraInfo):
-        filter.callback(resourceID, deepcopy(resourceInfo), deepcopy(newResources), deepcopy(extraInfo))
+    def asyncFilterCallbackWrapper(self, filter, resourceID, resourceInfo, newResources, extraInfo):
+        # Nobody waits for asynchronous callbacks, so their exceptions are reported here (the job keeps them too, 
+        # so that the resource is not marked as succeeded)
+        try: filter.callback(resourceID, resourceInfo, newResources, extraInfo)
+        except: 
+            self.server.echo.out("Exception in asynchronous callback of filter %s for resource %s." % (filter.name, resourceID), "EXCEPTION")
+            raise
+            
+    def callbacksDone(self, resourceKey, resourceInfo, succeeded):
+        # Called once all asynchronous callbacks of a resource have run, in the thread that ran the last of them. The resource 
+        # is marked as SUCCEEDED only now, so that it stays INPROGRESS (and is crawled again) if the server stops before that
+        persistStatus = persistence.StatusCodes()
+        try: 
+            if (succeeded): self.server.persist.update(resourceKey, persistStatus.SUCCEEDED, resourceInfo)
+            else: self.server.persist.update(resourceKey, persistStatus.ERROR, None)
+        except: self.server.echo.out("Exception while trying to update resource after its asynchronous callbacks.", "EXCEPTION")
                 
     def applyFilters(self, resourceID, resourceInfo):
         parallelFilters = self.server.parallelFilters
         sequentialFilters = self.server.sequentialFilters
         sequentialData = []
-        threadedData = []
     
-        # Start threaded filters
-        filterThreads = []
+        # Submit threaded filters to the filters pool
+        filterJobs = []
         for filter in parallelFilters:
-            t = threading.Thread(target=self.threadedFilterApplyWrapper, args=(filter, resourceID, resourceInfo, threadedData))
-            filterThreads.append(t)
-            t.start()
+            filterJobs.append(self.server.filtersPool.submitFilter(filter, self.threadedFilterApplyWrapper, (filter, resourceID, resourceInfo)))
         
         # Execute sequential filters
         extraInfo = {}
         for filter in sequentialFilters:
-            data = filter.apply(resourceID, deepcopy(resourceInfo), extraInfo)
+            data = filter.apply(resourceID, self.filterInput(filter, resourceInfo), extraInfo)
             sequentialData.append({"name": filter.name, "data": data})
             
         # Wait for threaded filters to finish
-        for filter in filterThreads:
-            filter.join()
+        threadedData = [job.wait() for job in filterJobs]
         
         filtersData = sequentialData + threadedData
         return (filtersData if (filtersData) else None)
         
-    def callbackFilters(self, resourceID, resourceInfo, extraInfo, newResources):
+    def callbackFilters(self, resourceID, resourceInfo, extraInfo, newResources, callbacksDone):
+        # Return whether asynchronous callbacks were submitted, in which case callbacksDone is called when all of them have run
         parallelFilters = self.server.parallelFilters
         sequentialFilters = self.server.sequentialFilters
+        asyncFilters = [filter for filter in parallelFilters if (filter.config["asynccallback"])]
+        callbacksGroup = CallbacksGroup(len(asyncFilters), callbacksDone)
     
-        # Start threaded filters
-        filterThreads = []
+        # Submit threaded filters to the filters pool. Threaded callbacks run at the same time as sequential ones, so their 
+        # input is copied right away, before sequential filters have the chance to change resourceInfo and newResources 
+        # (extraInfo is never changed). Read-only views are enough only if no sequential filter changes its input
+        filterJobs = []
+        sequentialChanges = any((not filter.config["readonly"]) for filter in sequentialFilters)
         for filter in parallelFilters:
-            t = threading.Thread(target=self.threadedFilterCallbackWrapper, args=(filter, resourceID, resourceInfo, newResources, extraInfo))
-            filterThreads.append(t)
-            t.start()
+            if (not filter.config["readonly"]): callbackInput = (deepcopy(resourceInfo), deepcopy(newResources), deepcopy(extraInfo))
+            elif (sequentialChanges): callbackInput = (common.freeze(deepcopy(resourceInfo)), common.freeze(deepcopy(newResources)), common.freeze(extraInfo))
+            else: callbackInput = (common.freeze(resourceInfo), common.freeze(newResources), common.freeze(extraInfo))
+            if (filter.config["asynccallback"]): 
+                self.server.filtersPool.submitCallback(filter, self.asyncFilterCallbackWrapper, (filter, resourceID) + callbackInput, callbacksGroup.jobDone)
+            else: 
+                filterJobs.append(self.server.filtersPool.submitFilter(filter, filter.callback, (resourceID,) + callbackInput))
         
         # Execute sequential filters
         extraInfoRef = {}
         for filter in sequentialFilters:
-            extraInfoRef["original"] = deepcopy(extraInfo)
-            filter.callback(resourceID, resourceInfo, newResources, extraInfoRef)
+            extraInfoRef["original"] = self.filterInput(filter, extraInfo)
+            if (filter.config["readonly"]): filter.callback(resourceID, common.freeze(resourceInfo), common.freeze(newResources), extraInfoRef)
+            else: filter.callback(resourceID, resourceInfo, newResources, extraInfoRef)
             
         # Wait for threaded filters to finish
-        for filter in filterThreads:
-            filter.join()
+        for job in filterJobs: job.wait()
+        
+        if (asyncFilters): callbacksGroup.close()
+        return bool(asyncFilters)
+        
+        
+class CallbacksGroup():
+    # Group of asynchronous callback jobs of the same resource. The given function is called as soon as all jobs are done 
+    # and the group is closed by whoever submitted them, telling whether all of the jobs succeeded. A group that is never 
+    # closed (because a sequential filter failed, for example) never calls the function
+    def __init__(self, size, function):
+        self.lock = threading.Lock()
+        self.remaining = size + 1
+        self.succeeded = True
+        self.function = function
+        
+    def _release(self, succeeded):
+        with self.lock:
+            self.remaining -= 1
+            self.succeeded = self.succeeded and succeeded
+            done = (self.remaining == 0)
+        if (done): self.function(self.succeeded)
         
+    def jobDone(self, job):
+        self._release(job.exception is None)
+        
+    def close(self):
+        self._release(True)
+            
+            
+class WorkersPool():
+    # Fixed size pool of long-lived threads, used to run jobs without creating a new thread for each of them. Jobs 
+    # are run in the order they are submitted and, when a callback is given, it is called with the job as argument 
+    # as soon as the job is done (in the same thread that ran it)
+    class Job():
+        def __init__(self, function, args, callback):
+            self.function = function
+            self.args = args
+            self.callback = callback
+            self.result = None
+            self.exception = None
+            self.doneEvent = threading.Event()
             
-class ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+        def run(self):
+            try: self.result = self.function(*self.args)
+            except: self.exception = sys.exc_info()
+            self.doneEvent.set()
+            if (self.callback): self.callback(self)
+            
+        def wait(self):
+            # Wait for the job to be done, returning its result or raising again the exception it raised
+            self.doneEvent.wait()
+            if (self.exception): raise self.exception[0], self.exception[1], self.exception[2]
+            return self.result
+
+    def __init__(self, size, name):
+        self.jobsQueue = Queue.Queue()
+        self.threads = []
+        for i in range(size):
+            t = threading.Thread(target = self._workerThread, name = "%s-%d" % (name, i + 1))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+            
+    def _workerThread(self):
+        while True:
+            job = self.jobsQueue.get()
+            if (job is None): break
+            job.run()
+            
+    def submit(self, function, args = (), callback = None):
+        job = WorkersPool.Job(function, args, callback)
+        self.jobsQueue.put(job)
+        return job
+        
+    def shutdown(self):
+        # Wait for the jobs already submitted to be done. Must not be called from one of the threads of the pool
+        for t in self.threads: self.jobsQueue.put(None)
+        for t in self.threads: t.join()
+        
+        
+class FiltersPool(WorkersPool):
+    # Workers pool shared by the parallel filters of the server. Each filter has at most as many jobs in the pool as set
+    # by its concurrency option (no limit other than the pool size, if zero), the remaining ones waiting in a queue of 
+    # the filter itself. This way, a slow filter can't take all threads of the pool while jobs of other filters wait.
+    # Jobs that nobody waits for (asynchronous callbacks) are submitted only while the queue of the filter has less 
+    # than callbackqueuesize jobs, blocking the caller otherwise
+    def __init__(self, size, filtersList):
+        WorkersPool.__init__(self, size, "Filter")
+        self.filtersList = filtersList
+        self.condition = threading.Condition()
+        self.limits = {}
+        self.running = {}
+        self.queues = {}
+        for filter in filtersList:
+            self.limits[filter] = filter.config["concurrency"] if (filter.config["concurrency"] > 0) else size
+            self.running[filter] = 0
+            self.queues[filter] = deque()
+            
+    def _jobDone(self, filter, callback, job):
+        # Hand the slot of the finished job to the next one queued for the same filter. The callback of the job is called 
+        # before, so that shutdown also waits for it
+        try: 
+            if (callback): callback(job)
+        finally: 
+            with self.condition:
+                if (self.queues[filter]): self.jobsQueue.put(self.queues[filter].popleft())
+                else: self.running[filter] -= 1
+                self.condition.notify_all()
+                
+    def submitFilter(self, filter, function, args = (), callback = None):
+        job = WorkersPool.Job(function, args, partial(self._jobDone, filter, callback))
+        with self.condition:
+            if (self.running[filter] < self.limits[filter]): 
+                self.running[filter] += 1
+                self.jobsQueue.put(job)
+            else: self.queues[filter].append(job)
+        return job
+        
+    def submitCallback(self, filter, function, args = (), callback = None):
+        with self.condition:
+            while (len(self.queues[filter]) >= filter.config["callbackqueuesize"]): self.condition.wait()
+            return self.submitFilter(filter, function, args, callback)
+        
+    def status(self):
+        # Number of jobs of each filter in the pool (either waiting for a thread or already running) and in its own queue, 
+        # along with the counters of its results cache
+        with self.condition: 
+            return [{"name": filter.name, "running": self.running[filter], "queued": len(self.queues[filter]), "cache": filter.applyCacheStatus()} for filter in self.filtersList]
+        
+    def shutdown(self):
+        # Jobs queued by the filters must reach the pool before its threads are stopped, so that no asynchronous callback is lost
+        with self.condition:
+            while (any(self.running.values())): self.condition.wait()
+        WorkersPool.shutdown(self)
+        
+        
+class AsyncServerHandler(ServerHandler):
+    # Handler used by the asynchronous engine. Differently from the threaded engine, handlers are not bound to a 
+    # thread: their methods are called by the server executor every time a message arrives on the connection
+    def __init__(self, connection, server):
+        self.request = connection.socket
+        self.client_address = connection.addr
+        self.server = server
+        self.thread = connection
+        self.client = AsyncNetworkHandler(connection)
+        
+    def waitResources(self): 
+        # Waiting would hold an executor thread, so the request is postponed instead
+        return False
+        
+    def waitFinished(self, ready, function):
+        # Waiting would hold an executor thread (and, with few of them, keep the connections being waited for from 
+        # finishing at all), so the connection checks the condition again from the event loop every time another one finishes
+        self.finishedWait = (ready, function)
+        
+    def closeConnection(self):
+        ServerHandler.closeConnection(self)
+        self.server.callFromThread(self.server._resumeWaiting)
+        
+        
+class AsyncNetworkHandler(common.NetworkHandler):
+    # Network handler for connections of the asynchronous engine. Instead of being written directly to the socket,
+    # messages are handed to the event loop, that is the only one allowed to do network operations
+    def __init__(self, connection):
+        common.NetworkHandler.__init__(self, connection.socket)
+        self.connection = connection
+        
+    def send(self, message):
+        strMsg = json.dumps(message, default = self._defaultSerializer)
+        msgSize = str(len(strMsg)).zfill(self.headersize)
+        self.connection.server.callFromThread(self.connection.push, msgSize + strMsg)
+        
+    def decode(self, strMsg):
+        return json.loads(strMsg, object_hook = self._defaultDeserializer)
+        
+    def close(self):
+        self.connection.server.callFromThread(self.connection.close_when_done)
+        
+        
+class AsyncConnection(asynchat.async_chat):
+    # Connection to a client (or to the manager) in the asynchronous engine. Messages received are processed one at a
+    # time and in order by the server executor, so that neither slow requests nor idle clients hold the event loop
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, server.socketsMap)
+        self.server = server
+        self.handler = AsyncServerHandler(self, server)
+        self.incomingData = []
+        self.messageSize = None
+        self.pendingMessages = deque()
+        self.handshakeDone = False
+        self.busy = False
+        self.peerClosed = False
+        self.alive = True
+        self.lastReplyTime = timeit.default_timer()
+        self.set_terminator(self.handler.client.headersize)
+        
+    def is_alive(self): 
+        # Mimic threading.Thread interface, so that the connection can take the place of the thread handling the client
+        return self.alive
+        
+    def collect_incoming_data(self, data): 
+        self.incomingData.append(data)
+        
+    def found_terminator(self):
+        data = "".join(self.incomingData)
+        self.incomingData = []
+        if (self.messageSize is None):
+            self.messageSize = int(data)
+            self.set_terminator(self.messageSize)
+        else:
+            self.messageSize = None
+            self.set_terminator(self.handler.client.headersize)
+            self._enqueue(self.handler.client.decode(data))
+            
+    def readable(self):
+        return (not self.peerClosed) and asynchat.async_chat.readable(self)
+            
+    def handle_close(self):
+        # An empty message tells the handler that the connection has been closed by the other side
+        if (not self.peerClosed): 
+            self.peerClosed = True
+            self._enqueue(None)
+        if (not self.alive): self.close()
+        
+    def handle_error(self):
+        self.server.echo.out("Exception in connection with %s:%s." % self.addr[:2], "EXCEPTION")
+        self.discard_buffers()
+        self.handle_close()
+    
+    def _enqueue(self, message):
+        self.pendingMessages.append((message, timeit.default_timer()))
+        self._processNext()
+        
+    def _processNext(self):
+        if (self.busy) or (not self.alive) or (not self.pendingMessages): return
+        self.busy = True
+        (message, arrivalTime) = self.pendingMessages.popleft()
+        self.server.executor.submit(self._process, (message, max(0.0, arrivalTime - self.lastReplyTime)))
+        
+    def _process(self, message, clientTime):
+        # Run by the executor
+        running = False
+        try: 
+            if (not self.handshakeDone):
+                self.handshakeDone = True
+                if (message): 
+                    self.handler.connect(message)
+                    running = self.handler.connectionAccepted
+            else: 
+                running = self.handler.processMessage(message, clientTime)
+                if (not running) and (not self.handler.finishedWait): self.handler.finish()
+        except:
+            self.server.echo.out("Exception while processing a request from %s:%s." % self.addr[:2], "EXCEPTION")
+            running = False
+        self.server.callFromThread(self._processed, message, running, self.handler.postponed)
+        
+    def _resume(self, function, running):
+        # Run by the executor once the condition the handler was waiting for holds
+        try: 
+            function()
+            if (not running) and (not self.handler.finishing) and (not self.handler.finishedWait): self.handler.finish()
+        except:
+            self.server.echo.out("Exception while processing a request from %s:%s." % self.addr[:2], "EXCEPTION")
+            running = False
+        self.server.callFromThread(self._processed, None, running, False)
+        
+    def _processed(self, message, running, postponed):
+        self.busy = False
+        self.lastReplyTime = timeit.default_timer()
+        if (self.handler.finishedWait): 
+            self.busy = True
+            self.waitRunning = running
+            self.server.waitingConnections.add(self)
+            self._checkWait()
+        elif (not running): 
+            self.alive = False
+            self.close_when_done()
+        elif (postponed):
+            self.handler.postponed = False
+            self.busy = True
+            self.postponedMessage = message
+            self.server.postponedConnections.add(self)
+            self.server.callLater(5, self._retry)
+        else: self._processNext()
+        
+    def _checkWait(self):
+        # Called when the handler starts waiting and every time a connection finishes, until the condition holds
+        (ready, function) = self.handler.finishedWait
+        with finishedCondition: 
+            if (not ready()): return
+        self.server.waitingConnections.remove(self)
+        self.handler.finishedWait = None
+        self.server.executor.submit(self._resume, (function, self.waitRunning))
+        
+    def _retry(self):
+        # Called when new resources become available or when the postponing time expires, whichever comes first
+        if (self not in self.server.postponedConnections): return
+        self.server.postponedConnections.remove(self)
+        self.busy = False
+        self.pendingMessages.appendleft((self.postponedMessage, self.lastReplyTime))
+        self._processNext()
+        
+        
+class AsyncListener(asyncore.dispatcher):
+    # Accept new connections for the asynchronous engine
+    def __init__(self, server):
+        asyncore.dispatcher.__init__(self, server.socket, server.socketsMap)
+        self.server = server
+        self.accepting = True
+        
+    def handle_accept(self):
+        pair = self.accept()
+        if (pair is not None): AsyncConnection(pair[0], self.server)
+        
+        
+class AsyncWaker(asyncore.dispatcher):
+    # Wake up the event loop when other threads have something for it to do. A pair of connected 
+    # sockets is used (instead of a pipe, for example) because it works on every platform
+    def __init__(self, server):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        self.writer = socket.socket()
+        self.writer.connect(listener.getsockname())
+        self.writer.setblocking(0)
+        reader = listener.accept()[0]
+        listener.close()
+        asyncore.dispatcher.__init__(self, reader, server.socketsMap)
+        
+    def wake(self):
+        try: self.writer.send("x")
+        except socket.error: pass
+        
+    def writable(self): 
+        return False
+        
+    def handle_read(self): 
+        self.recv(4096)
+        
+    def handle_close(self):
+        self.writer.close()
+        self.close()
+        
+        
+class BaseTCPServer(SocketServer.TCPServer):
     def __init__(self, configurationsDictionary):
         self.config = configurationsDictionary
         
@@ -398,11 +867,23 @@ class ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
             filterOptions = self.config["server"]["filtering"]["filter"][i]
             if (filterOptions["parallel"]): self.parallelFilters.append(FilterClass(filterOptions))
             else: self.sequentialFilters.append(FilterClass(filterOptions))
+        self.filtersPool = FiltersPool(self.config["server"]["filtering"]["poolsize"], self.parallelFilters)
         
         # Call SocketSever constructor
         self.allow_reuse_address = True # Avoid "Address already in use" error when restarting server right after a shutdown
         SocketServer.TCPServer.__init__(self, (self.config["global"]["connection"]["address"], self.config["global"]["connection"]["port"]), ServerHandler)
-    
+        
+    def shutdownComponents(self):
+        self.echo.out("Shutting down filters...")
+        self.filtersPool.shutdown()
+        for filter in self.parallelFilters: filter.shutdown()
+        for filter in self.sequentialFilters: filter.shutdown()
+        
+        self.echo.out("Shutting down persistence handler...")
+        self.persist.shutdown()
+        
+        
+class ThreadedTCPServer(SocketServer.ThreadingMixIn, BaseTCPServer):
     def run(self):
         self.startTime = datetime.now()
         self.state = "running"
@@ -414,12 +895,67 @@ class ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
         else: self.echo.out("Server manually shut down.")
         
     def shutdown(self):
-        self.echo.out("Shutting down filters...")
-        for filter in self.parallelFilters: filter.shutdown()
-        for filter in self.sequentialFilters: filter.shutdown()
-        
-        self.echo.out("Shutting down persistence handler...")
-        self.persist.shutdown()
-            
+        self.shutdownComponents()
         SocketServer.TCPServer.shutdown(self)
+        
+        
+class AsyncTCPServer(BaseTCPServer):
+    # Event loop based server. A single thread (the one that calls run) takes care of all network operations, while 
+    # requests are processed by a bounded pool of executor threads. This way, idle clients cost just a socket instead
+    # of a thread each, and requests waiting for new resources are postponed by the event loop instead of holding a thread
+    def __init__(self, configurationsDictionary):
+        BaseTCPServer.__init__(self, configurationsDictionary)
+        self.socketsMap = {}
+        self.callsQueue = deque()
+        self.timersHeap = []
+        self.postponedConnections = set()
+        self.waitingConnections = set()
+        self.stopping = False
+        
+    def callFromThread(self, function, *args):
+        # Schedule a call to be run by the event loop. Can be safely used from any thread
+        self.callsQueue.append((function, args))
+        self.waker.wake()
+        
+    def callLater(self, delay, function, *args):
+        # Schedule a call to be run by the event loop after delay seconds. Must be used only from the event loop thread
+        heapq.heappush(self.timersHeap, (timeit.default_timer() + delay, function, args))
+        
+    def _resumePostponed(self):
+        for connection in list(self.postponedConnections): connection._retry()
+        
+    def _resumeWaiting(self):
+        for connection in list(self.waitingConnections): connection._checkWait()
+        
+    def run(self):
+        self.startTime = datetime.now()
+        self.state = "running"
+        self.executor = WorkersPool(self.config["server"]["executorsize"], "Executor")
+        self.waker = AsyncWaker(self)
+        self.listener = AsyncListener(self)
+        self.persist.addAvailableListener(partial(self.callFromThread, self._resumePostponed))
+        
+        self.echo.out("Server ready. Waiting for connections...")
+        while (not self.stopping) or (len(self.socketsMap) > 1):
+            timeout = 1.0
+            if (self.timersHeap): timeout = max(0.0, min(timeout, self.timersHeap[0][0] - timeit.default_timer()))
+            asyncore.loop(timeout, False, self.socketsMap, 1)
+            while (self.callsQueue): 
+                (function, args) = self.callsQueue.popleft()
+                function(*args)
+            while (self.timersHeap) and (self.timersHeap[0][0] <= timeit.default_timer()):
+                (callTime, function, args) = heapq.heappop(self.timersHeap)
+                function(*args)
+            if (self.stopping) and (self.listener.accepting): self.listener.close()
+        self.waker.handle_close()
+        self.executor.shutdown()
+        
+        if (self.state == "finishing"): self.echo.out("Server finished." )
+        else: self.echo.out("Server manually shut down.")
+        
+    def shutdown(self):
+        # Stop accepting connections, letting the event loop finish as soon as the remaining ones are closed
+        self.shutdownComponents()
+        self.stopping = True
+        self.waker.wake()
         
\ No newline at end of file